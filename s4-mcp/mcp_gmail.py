@@ -1,31 +1,129 @@
 import os
+import re
 import base64
-import json
-import time
 import sys
+import logging
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+from io import BytesIO
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
+import httplib2
 from googleapiclient.discovery import build
-from email.mime.text import MIMEText
-from mcp.server.fastmcp import FastMCP
+from googleapiclient.discovery_cache.base import Cache
+from googleapiclient.errors import HttpError
+from email import policy
+from email.generator import BytesGenerator
+from email.message import EmailMessage
+from email.utils import parseaddr
+from mcp.server.fastmcp import FastMCP, Context
 from mcp.types import TextContent
 from mcp.server.fastmcp.prompts import base
 import html
+import asyncio
 import aiohttp
+from mcp_transport import get_transport
+
+# pybase64 decodes message bodies with SIMD; fall back to the stdlib
+try:
+    from pybase64 import urlsafe_b64decode
+except ImportError:
+    from base64 import urlsafe_b64decode
+
+# orjson parses token.json several times faster; fall back to the stdlib
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
 # If modifying these SCOPES, delete the file token.json.
 SCOPES = ['https://www.googleapis.com/auth/gmail.modify']
 
+# Gmail API accepts at most 100 calls per batch request
+BATCH_LIMIT = 100
+
+# Partial-response masks so Gmail only returns the fields we actually read
+# (parts are masked three levels deep to reach text inside nested multiparts)
+_PART_FIELDS = 'mimeType,body/data,parts(mimeType,body/data,parts(mimeType,body/data))'
+HEADERS_FIELDS = 'snippet,payload/headers'
+
+GMAIL_API_URL = "https://gmail.googleapis.com/gmail/v1/users/me"
+
+class _DiscoveryMemoryCache(Cache):
+    """Keeps the Gmail discovery document in memory so each per-thread service
+    is built without re-downloading it; API responses are never cached."""
+    _documents = {}
+
+    def get(self, url):
+        return self._documents.get(url)
+
+    def set(self, url, content):
+        self._documents[url] = content
+
+# Matches a "Query:" line and captures everything up to the next "Section:" line
+_QUERY_RE = re.compile(
+    r'^[^\S\n]*query:[^\S\n]*$\n?(.*?)(?=^[^\n]*:[^\S\n]*$|\Z)',
+    re.IGNORECASE | re.MULTILINE | re.DOTALL
+)
+
+# Log to stderr so nothing interleaves with the MCP stdio transport on stdout
+logging.basicConfig(stream=sys.stderr, level=logging.INFO,
+                    format='%(asctime)s %(levelname)s %(message)s')
+log = logging.getLogger("mcp_gmail")
+
+@asynccontextmanager
+async def lifespan(server):
+    """Close the shared HTTP sessions when the MCP server shuts down."""
+    try:
+        yield
+    finally:
+        if _gemini_session is not None and not _gemini_session.closed:
+            await _gemini_session.close()
+        if _gmail_client is not None:
+            await _gmail_client.close()
+
 # Instantiate an MCP server client
-mcp = FastMCP("Gmail Assistant")
+mcp = FastMCP("Gmail Assistant", lifespan=lifespan)
 
-def get_gmail_service():
-    """Get an authorized Gmail API service instance."""
+# Shared aiohttp session for Gemini calls, created on first use
+_gemini_session = None
+
+# LRU of Gemini responses keyed by prompt hash
+GEMINI_CACHE_SIZE = 256
+_gemini_cache = OrderedDict()
+
+# Cached credentials, reused across tool calls until invalidated
+_gmail_creds = None
+_gmail_creds_lock = threading.Lock()
+
+# httplib2 is not thread-safe, so each worker thread caches its own service
+_gmail_local = threading.local()
+
+# Blocking googleapiclient calls run here so async tools don't stall the event loop
+_GMAIL_POOL = ThreadPoolExecutor(max_workers=16, thread_name_prefix="gmail")
+
+@functools.lru_cache(maxsize=1)
+def _load_token_info(mtime_ns):
+    """Parse token.json; keyed on its mtime so a rotated token is re-read."""
+    with open('token.json', 'rb') as token:
+        return json_loads(token.read())
+
+def get_credentials():
+    """Get valid user credentials, running the OAuth flow if needed."""
     creds = None
     # The file token.json stores the user's access and refresh tokens
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_info(json.load(open('token.json')))
+    try:
+        mtime_ns = os.stat('token.json').st_mtime_ns
+    except FileNotFoundError:
+        mtime_ns = None
+    if mtime_ns is not None:
+        creds = Credentials.from_authorized_user_info(_load_token_info(mtime_ns))
     
     # If there are no (valid) credentials available, let the user log in.
     if not creds or not creds.valid:
@@ -40,71 +138,264 @@ def get_gmail_service():
         with open('token.json', 'w') as token:
             token.write(creds.to_json())
 
-    return build('gmail', 'v1', credentials=creds)
+    return creds
+
+def get_cached_credentials():
+    """Get the cached credentials, reloading them only once they stop being valid."""
+    global _gmail_creds
+    with _gmail_creds_lock:
+        if _gmail_creds is None or not _gmail_creds.valid:
+            _gmail_creds = get_credentials()
+        return _gmail_creds
+
+def get_gmail_service():
+    """Get an authorized Gmail API service instance for the current thread."""
+    creds = get_cached_credentials()
+    if getattr(_gmail_local, 'creds', None) is not creds:
+        # Keep-alive transport reused for every call
+        authed_http = AuthorizedHttp(creds, http=httplib2.Http(timeout=30))
+        _gmail_local.service = build('gmail', 'v1', http=authed_http,
+                                     cache_discovery=True, cache=_DiscoveryMemoryCache())
+        _gmail_local.creds = creds
+    return _gmail_local.service
+
+async def run_blocking(func, *args):
+    """Run a blocking Gmail call on the worker pool without blocking the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(_GMAIL_POOL, func, *args)
+
+def invalidate_on_auth_error(error):
+    """Drop the cached credentials (and with them every service) if the API rejected them."""
+    global _gmail_creds
+    status = None
+    if isinstance(error, HttpError):
+        status = error.resp.status
+    elif isinstance(error, aiohttp.ClientResponseError):
+        status = error.status
+    if status == 401:
+        with _gmail_creds_lock:
+            _gmail_creds = None
+
+class GmailClient:
+    """Async Gmail REST client that shares one aiohttp session across tool calls."""
+
+    def __init__(self, creds):
+        self.creds = creds
+        self._session = None
+        self._refresh_lock = asyncio.Lock()
+
+    def _get_session(self):
+        # Created lazily so the connector binds to the running event loop
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=50, ttl_dns_cache=300)
+            )
+        return self._session
+
+    async def _auth_headers(self):
+        if not self.creds.valid:
+            # The refresh is a blocking HTTP call; concurrent fetches wait for one
+            async with self._refresh_lock:
+                if not self.creds.valid:
+                    await asyncio.to_thread(self.creds.refresh, Request())
+        return {"Authorization": f"Bearer {self.creds.token}"}
+
+    async def get_message(self, msg_id, format='full', fields=None, metadata_headers=()):
+        """Fetch a single message resource, optionally masked to the given fields."""
+        params = [('format', format)]
+        if fields:
+            params.append(('fields', fields))
+        params.extend(('metadataHeaders', header) for header in metadata_headers)
+        session = self._get_session()
+        async with session.get(
+            f"{GMAIL_API_URL}/messages/{msg_id}",
+            params=params,
+            headers=await self._auth_headers()
+        ) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    async def iter_messages(self, msg_ids, **kwargs):
+        """Fetch several messages concurrently, yielding (id, message) as each arrives."""
+        async def _fetch(msg_id):
+            return msg_id, await self.get_message(msg_id, **kwargs)
+
+        for next_done in asyncio.as_completed([_fetch(msg_id) for msg_id in msg_ids]):
+            try:
+                yield await next_done
+            except Exception as e:
+                # Skip the ones that fail
+                invalidate_on_auth_error(e)
+                log.error("gmail op failed: %s", e)
+
+    async def get_messages(self, msg_ids, **kwargs):
+        """Fetch several messages concurrently, skipping the ones that fail."""
+        return {msg_id: message async for msg_id, message in self.iter_messages(msg_ids, **kwargs)}
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+_gmail_client = None
+
+def get_gmail_client():
+    """Get the shared async Gmail client, refreshing its credentials."""
+    global _gmail_client
+    creds = get_cached_credentials()
+    if _gmail_client is None:
+        _gmail_client = GmailClient(creds)
+    else:
+        _gmail_client.creds = creds
+    return _gmail_client
 
 def create_message(sender, to, subject, message_text):
     """Create a message for an email."""
-    message = MIMEText(message_text)
-    message['to'] = to
-    message['from'] = sender
-    message['subject'] = subject
-    return {'raw': base64.urlsafe_b64encode(message.as_bytes()).decode()}
+    message = EmailMessage()
+    message['To'] = to
+    message['From'] = sender
+    message['Subject'] = subject
+    message.set_content(message_text)
+    buffer = BytesIO()
+    BytesGenerator(buffer, policy=policy.SMTP).flatten(message)
+    return {'raw': base64.urlsafe_b64encode(buffer.getvalue()).decode('ascii')}
 
 def send_message(service, user_id, message):
     """Send an email message."""
     try:
         message = service.users().messages().send(userId=user_id, body=message).execute()
-        print(f"Message Id: {message['id']}")
+        log.info("Message Id: %s", message['id'])
         return message
     except Exception as e:
-        print(f"An error occurred: {e}")
+        invalidate_on_auth_error(e)
+        log.exception("gmail op failed")
         return None
 
-def get_messages(service, user_id='me', query=''):
-    """List all Messages of the user's mailbox matching the query."""
+def get_messages(service, user_id='me', query='', max_results=None):
+    """
+    List Messages of the user's mailbox matching the query.
+    
+    Args:
+        max_results: Stop paging once this many messages are listed (default: all)
+    """
     try:
-        response = service.users().messages().list(userId=user_id, q=query).execute()
+        # Only ask for as many IDs as the caller will use (the API caps pages at 500)
+        page_size = min(500, max_results) if max_results else None
+        messages_api = service.users().messages()
+        response = messages_api.list(
+            userId=user_id, q=query, maxResults=page_size,
+            fields='messages/id,nextPageToken').execute()
         messages = []
         if 'messages' in response:
             messages.extend(response['messages'])
 
         while 'nextPageToken' in response:
+            if max_results and len(messages) >= max_results:
+                break
             page_token = response['nextPageToken']
-            response = service.users().messages().list(
-                userId=user_id, q=query, pageToken=page_token).execute()
+            response = messages_api.list(
+                userId=user_id, q=query, maxResults=page_size, pageToken=page_token,
+                fields='messages/id,nextPageToken').execute()
             if 'messages' in response:
                 messages.extend(response['messages'])
 
-        return messages
+        return messages[:max_results] if max_results else messages
     except Exception as e:
-        print(f"An error occurred: {e}")
+        invalidate_on_auth_error(e)
+        log.exception("gmail op failed")
         return []
 
-def get_message_content(service, user_id, msg_id):
-    """Get a Message with given ID."""
-    try:
-        message = service.users().messages().get(userId=user_id, id=msg_id).execute()
-        
-        # Get email body
-        payload = message['payload']
-        parts = payload.get('parts', [])
-        
-        if not parts:
-            data = payload.get('body', {}).get('data', '')
-            if data:
-                return base64.urlsafe_b64decode(data).decode()
-            return ""
-        
-        for part in parts:
-            if part['mimeType'] == 'text/plain':
-                data = part['body'].get('data', '')
-                if data:
-                    return base64.urlsafe_b64decode(data).decode()
-        
-        return ""
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        return ""
+@functools.lru_cache(maxsize=1024)
+def canonical_header(name):
+    """Canonicalize a header name (e.g. 'from' -> 'From') so lookups are case-insensitive."""
+    return name.title()
+
+def _iter_text_parts(payload):
+    """Lazily walk nested MIME parts, yielding the data of each text/plain part."""
+    if payload.get('mimeType', '').startswith('text/plain'):
+        data = payload.get('body', {}).get('data')
+        if data:
+            yield data
+    for part in payload.get('parts', ()):
+        yield from _iter_text_parts(part)
+
+def find_body_data(payload):
+    """Find the still-encoded plain text body data in a message payload."""
+    if not payload.get('parts'):
+        return payload.get('body', {}).get('data', '')
+    
+    # Stop at the first text/plain part, however deeply it is nested
+    # (e.g. multipart/mixed > multipart/alternative > text/plain)
+    return next(_iter_text_parts(payload), "")
+
+def extract_body(payload):
+    """Extract the plain text body from a message payload."""
+    data = find_body_data(payload)
+    if data:
+        return urlsafe_b64decode(data).decode('utf-8')
+    return ""
+
+def _b64_needles(marker):
+    """Base64url forms of marker at each of the three possible byte alignments."""
+    needles = []
+    for offset in range(3):
+        encoded = base64.urlsafe_b64encode(b'\0' * offset + marker).decode()
+        # Keep only the characters determined entirely by the marker bytes
+        start = -(-offset * 8 // 6)
+        end = (offset + len(marker)) * 8 // 6
+        needles.append(encoded[start:end])
+    return needles
+
+# Encoded MCP markers, so non-MCP bodies can be skipped without decoding them
+_MCP_NEEDLES = _b64_needles(b'MCP') + _b64_needles(b'Model Context Protocol')
+
+def may_be_mcp_email(data):
+    """Cheap pre-filter on encoded body data; False means the email is not MCP."""
+    return any(needle in data for needle in _MCP_NEEDLES)
+
+def batch_execute(service, requests):
+    """
+    Execute Gmail API requests as multipart batches instead of one round-trip each.
+    
+    Args:
+        service: Authorized Gmail API service instance
+        requests: Dict mapping a request id to an unexecuted API request
+    
+    Returns:
+        A dict mapping each successful request id to its response
+    """
+    results = {}
+    
+    def _collect(request_id, response, exception):
+        if exception is not None:
+            invalidate_on_auth_error(exception)
+            log.error("gmail op failed: %s", exception)
+            return
+        results[request_id] = response
+    
+    items = list(requests.items())
+    for start in range(0, len(items), BATCH_LIMIT):
+        batch = service.new_batch_http_request(callback=_collect)
+        for request_id, request in items[start:start + BATCH_LIMIT]:
+            batch.add(request, request_id=request_id)
+        batch.execute()
+    
+    return results
+
+def batch_get_messages(service, user_id, msg_ids):
+    """Fetch headers and body for all IDs in as few batches as possible."""
+    messages = service.users().messages()
+    fields = f'payload(mimeType,headers,body/data,parts({_PART_FIELDS}))'
+    return batch_execute(service, {
+        msg_id: messages.get(userId=user_id, id=msg_id, format='full', fields=fields)
+        for msg_id in msg_ids
+    })
+
+def batch_mark_as_read(service, user_id, msg_ids):
+    """Mark several Messages as read in as few batches as possible."""
+    messages = service.users().messages()
+    return batch_execute(service, {
+        msg_id: messages.modify(userId=user_id, id=msg_id, body={'removeLabelIds': ['UNREAD']})
+        for msg_id in msg_ids
+    })
 
 def mark_as_read(service, user_id, msg_id):
     """Mark a Message as read."""
@@ -116,28 +407,16 @@ def mark_as_read(service, user_id, msg_id):
         ).execute()
         return True
     except Exception as e:
-        print(f"An error occurred: {e}")
+        invalidate_on_auth_error(e)
+        log.exception("gmail op failed")
         return False
 
 def process_mcp_email(content):
     """Process MCP formatted email content."""
-    # Basic MCP processing - extract the query
-    lines = content.strip().split('\n')
-    query = ""
-    
-    # Look for the query in the email
-    for i, line in enumerate(lines):
-        if line.strip().lower() == "query:":
-            # Get the query text (everything after "Query:" until the next section or end)
-            query_lines = []
-            j = i + 1
-            while j < len(lines) and not lines[j].strip().endswith(":"):
-                query_lines.append(lines[j])
-                j += 1
-            query = "\n".join(query_lines).strip()
-            break
-    
-    return query
+    # Basic MCP processing - extract the query text following a "Query:" line,
+    # up to the next section header ("Something:") or the end of the email
+    match = _QUERY_RE.search(content)
+    return match.group(1).strip() if match else ""
 
 def handle_mcp_emails():
     """Main function to handle MCP emails."""
@@ -146,57 +425,94 @@ def handle_mcp_emails():
     # Get unread emails
     messages = get_messages(service, query='is:unread')
     
-    for msg in messages:
-        msg_id = msg['id']
-        content = get_message_content(service, 'me', msg_id)
+    # Fetch every message (headers and body) in one batch
+    full_messages = batch_get_messages(service, 'me', [msg['id'] for msg in messages])
+    
+    processed_ids = []
+    for msg_id, message in full_messages.items():
+        # Skip the decode entirely when neither marker can be in the body
+        data = find_body_data(message['payload'])
+        if not may_be_mcp_email(data):
+            continue
+        content = urlsafe_b64decode(data).decode('utf-8')
         
         # Check if this is an MCP email (simple check)
         if "MCP" in content or "Model Context Protocol" in content:
             query = process_mcp_email(content)
             
             if query:
-                print(f"Received MCP query: {query}")
+                log.info("Received MCP query: %s", query)
                 
                 # Here you would process the query with your LLM
                 # For demonstration, we'll just echo it back
                 response = f"I received your query: {query}\n\nThis is an automated response from the MCP Gmail agent."
                 
                 # Get the sender's email to reply to
-                message = service.users().messages().get(userId='me', id=msg_id, format='metadata', 
-                                                        metadataHeaders=['From', 'Subject']).execute()
-                
-                headers = {h['name']: h['value'] for h in message['payload']['headers']}
-                sender_email = headers.get('From', '').split('<')[-1].split('>')[0]
+                headers = {canonical_header(h['name']): h['value'] for h in message['payload']['headers']}
+                _, sender_email = parseaddr(headers.get('From', ''))
                 subject = f"Re: {headers.get('Subject', 'Your MCP Query')}"
                 
                 # Send reply
                 if sender_email:
                     email_message = create_message('me', sender_email, subject, response)
                     send_message(service, 'me', email_message)
-                    print(f"Sent response to {sender_email}")
+                    log.info("Sent response to %s", sender_email)
             
-            # Mark the email as read
-            mark_as_read(service, 'me', msg_id)
+            processed_ids.append(msg_id)
+    
+    # Mark the processed emails as read
+    batch_mark_as_read(service, 'me', processed_ids)
+
+_BOX_TOP = "┏━━━━━━━━━━━━━━━━━━━━━ EMAIL {i} ━━━━━━━━━━━━━━━━━━━━━┓"
+_BOX_MID = "┣━━━━━━━━━━━━━━━━━━━ PREVIEW ━━━━━━━━━━━━━━━━━━━┫"
+_BOX_BOT = "┗━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┛"
+
+def _trunc(text, limit):
+    """Truncate text to at most limit characters, marking the cut with '...'."""
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+def render_email(i, email):
+    """Render one email as a box-drawn block for show_unread_emails."""
+    # Clean up the subject and from fields for better display
+    subject = _trunc(email['subject'], 60)
+    
+    sender = email['from']
+    if len(sender) > 60:
+        # Shorten the display name but keep the address intact
+        name, sep, email_addr = sender.partition('<')
+        sender = _trunc(name, 30) + sep + email_addr if sep else _trunc(sender, 60)
+    
+    return "\n".join([
+        "",
+        _BOX_TOP.format(i=i + 1),
+        "┃ From:    " + sender,
+        "┃ Subject: " + subject,
+        "┃ Date:    " + email['date'],
+        "┃ ID:      " + email['id'],
+        _BOX_MID,
+        email['snippet'],
+        _BOX_BOT,
+        "",
+    ])
 
 # MCP TOOLS
 
 @mcp.tool()
-async def show_unread_emails(max_emails: int = 5) -> dict:
+async def show_unread_emails(max_emails: int = 5, ctx: Context = None) -> dict:
     """
     Retrieve and display unread emails from Gmail
     
     Args:
         max_emails: Maximum number of emails to retrieve (default: 5)
+        ctx: MCP request context, used to report progress per email
     
     Returns:
         A dictionary containing the unread emails
     """
     try:
-        # Get Gmail service
-        service = get_gmail_service()
-        
         # Get unread emails
-        messages = get_messages(service, query='is:unread')
+        messages = await run_blocking(
+            lambda: get_messages(get_gmail_service(), query='is:unread', max_results=max_emails))
         
         if not messages:
             return {
@@ -208,83 +524,42 @@ async def show_unread_emails(max_emails: int = 5) -> dict:
                 ]
             }
         
-        # Limit the number of emails to retrieve
-        messages = messages[:max_emails]
-        
-        # Process each email to get content
-        email_list = []
-        for msg in messages:
-            msg_id = msg['id']
-            
-            # Get message details
-            message = service.users().messages().get(
-                userId='me', 
-                id=msg_id, 
-                format='metadata', 
-                metadataHeaders=['From', 'Subject', 'Date']
-            ).execute()
-            
+        # Fetch only headers and snippet for every email concurrently; the
+        # preview uses the snippet, so the body is never downloaded. Each
+        # email is rendered as soon as its fetch completes.
+        formatted_emails = []
+        async for msg_id, message in get_gmail_client().iter_messages(
+            [msg['id'] for msg in messages],
+            format='metadata',
+            fields=HEADERS_FIELDS,
+            metadata_headers=['From', 'Subject', 'Date']
+        ):
             # Extract headers
-            headers = {h['name']: h['value'] for h in message['payload']['headers']}
+            headers = {canonical_header(h['name']): h['value'] for h in message['payload']['headers']}
             
-            # Get email content
-            content = get_message_content(service, 'me', msg_id)
-            
-            # Truncate content if too long
-            if len(content) > 300:
-                content = content[:300] + "... [content truncated]"
-            
-            # Add to email list
-            email_list.append({
+            email = {
                 'id': msg_id,
                 'from': headers.get('From', 'Unknown Sender'),
                 'subject': headers.get('Subject', 'No Subject'),
                 'date': headers.get('Date', 'Unknown Date'),
-                'snippet': message.get('snippet', ''),
-                'content': content
-            })
-        
-        # Format the emails in a more readable way
-        formatted_emails = []
-        for i, email in enumerate(email_list):
-            # Clean up the subject and from fields for better display
-            subject = email['subject']
-            if len(subject) > 60:
-                subject = subject[:57] + "..."
-                
-            sender = email['from']
-            if len(sender) > 60:
-                if '<' in sender:
-                    name, email_addr = sender.split('<', 1)
-                    if len(name) > 30:
-                        name = name[:27] + "..."
-                    sender = f"{name} <{email_addr}"
-                else:
-                    sender = sender[:57] + "..."
+                'snippet': message.get('snippet', '')
+            }
+            formatted_emails.append(render_email(len(formatted_emails), email))
             
-            formatted_email = f"""
-┏━━━━━━━━━━━━━━━━━━━━━ EMAIL {i+1} ━━━━━━━━━━━━━━━━━━━━━┓
-┃ From:    {sender}
-┃ Subject: {subject}
-┃ Date:    {email['date']}
-┃ ID:      {email['id']}
-┣━━━━━━━━━━━━━━━━━━━ PREVIEW ━━━━━━━━━━━━━━━━━━━┫
-{email['snippet']}
-┗━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━┛
-"""
-            formatted_emails.append(formatted_email)
-            data = json.loads(formatted_emails)["content"][0]["text"]
-            cleaned = html.unescape(data.encode('utf-8').decode('unicode_escape'))
-            # formatted = "\n\n".join([f"---\n\n{email.replace('\\n', '\\n')}" for email in emails])
+            # Let the client show progress while the remaining fetches finish
+            if ctx is not None:
+                await ctx.report_progress(len(formatted_emails), len(messages))
         
-        # Join all formatted emails with a separator
+        # Join all formatted emails with a separator, then decode HTML
+        # entities (Gmail snippets contain &#39; etc.) in a single pass
         all_emails = "\n".join(formatted_emails)
+        cleaned = html.unescape(all_emails)
         
         return {
             "content": [
                 TextContent(
                     type="text",
-                    text=f"📬 Found {len(email_list)} unread emails:\n{cleaned}"
+                    text=f"📬 Found {len(formatted_emails)} unread emails:\n{cleaned}"
                 )
             ]
         }
@@ -298,6 +573,16 @@ async def show_unread_emails(max_emails: int = 5) -> dict:
             ]
         }
 
+def get_gemini_session():
+    """Get the shared Gemini HTTP session, keeping connections alive between calls."""
+    global _gemini_session
+    if _gemini_session is None or _gemini_session.closed:
+        _gemini_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=600, keepalive_timeout=75),
+            timeout=aiohttp.ClientTimeout(total=30)
+        )
+    return _gemini_session
+
 async def call_gemini_api(prompt: str) -> dict:
     """
     Call the Gemini API to generate email subject and message based on a prompt.
@@ -308,6 +593,12 @@ async def call_gemini_api(prompt: str) -> dict:
     Returns:
         A dictionary containing the generated subject and message.
     """
+    # Identical prompts get identical answers; skip the round-trip
+    key = hashlib.blake2b(prompt.encode(), digest_size=16).hexdigest()
+    if key in _gemini_cache:
+        _gemini_cache.move_to_end(key)
+        return dict(_gemini_cache[key])
+
     api_url = "https://api.gemini.com/generate"  # Replace with the actual Gemini API endpoint
     api_key = os.getenv("GEMINI_API_KEY")  # Read the API key from the .env file
     headers = {
@@ -319,20 +610,25 @@ async def call_gemini_api(prompt: str) -> dict:
         "max_tokens": 100  # Adjust based on your needs
     }
 
-    async with aiohttp.ClientSession() as session:
-        async with session.post(api_url, json=payload, headers=headers) as response:
-            if response.status == 200:
-                data = await response.json()
-                return {
-                    "subject": data.get("subject", "Default Subject"),
-                    "message": data.get("message", "Default message content.")
-                }
-            else:
-                # Handle errors or unexpected responses
-                return {
-                    "subject": "Error generating subject",
-                    "message": "Error generating message from Gemini API."
-                }
+    session = get_gemini_session()
+    async with session.post(api_url, json=payload, headers=headers) as response:
+        if response.status == 200:
+            data = await response.json()
+            result = {
+                "subject": data.get("subject", "Default Subject"),
+                "message": data.get("message", "Default message content.")
+            }
+            # Only successful responses are cached, evicting the least recently used
+            _gemini_cache[key] = result
+            if len(_gemini_cache) > GEMINI_CACHE_SIZE:
+                _gemini_cache.popitem(last=False)
+            return dict(result)
+        else:
+            # Handle errors or unexpected responses
+            return {
+                "subject": "Error generating subject",
+                "message": "Error generating message from Gemini API."
+            }
 
 @mcp.tool()
 async def send_gmail(recipient: str = None, subject: str = None, message: str = None) -> dict:
@@ -356,7 +652,7 @@ async def send_gmail(recipient: str = None, subject: str = None, message: str =
             subject = generated_content.get('subject', 'Default Subject')  # Fallback to a default subject
             message = generated_content.get('message', 'Default message content.')  # Fallback to a default message
         
-        success = send_email_from_mcp(recipient, subject, message)
+        success = await run_blocking(send_email_from_mcp, recipient, subject, message)
         
         if success:
             return {
@@ -398,10 +694,8 @@ async def mark_email_as_read(email_id: str) -> dict:
         A dictionary indicating success or failure
     """
     try:
-        service = get_gmail_service()
-        
         # Mark the email as read
-        success = mark_as_read(service, 'me', email_id)
+        success = await run_blocking(lambda: mark_as_read(get_gmail_service(), 'me', email_id))
         
         if success:
             return {
@@ -454,14 +748,14 @@ def send_email_from_mcp(recipient_email, subject, message_body):
         result = send_message(service, sender, email_message)
         
         if result:
-            print(f"Email sent successfully to {recipient_email}")
+            log.info("Email sent successfully to %s", recipient_email)
             return True
         else:
-            print(f"Failed to send email to {recipient_email}")
+            log.warning("Failed to send email to %s", recipient_email)
             return False
             
-    except Exception as e:
-        print(f"Error sending email: {e}")
+    except Exception:
+        log.exception("Error sending email")
         return False
 
 # @mcp.tool()
@@ -527,8 +821,8 @@ def send_email_from_mcp(recipient_email, subject, message_body):
 
 if __name__ == "__main__":
     # Check if running with mcp dev command
-    print("Starting Gmail MCP Server...")
+    log.info("Starting Gmail MCP Server...")
     if len(sys.argv) > 1 and sys.argv[1] == "dev":
         mcp.run()  # Run without transport for dev server
     else:
-        mcp.run(transport="stdio")  # Run with stdio for direct execution
+        mcp.run(transport=get_transport(sys.argv))  # stdio unless configured otherwise
@@ -4,14 +4,21 @@ from mcp.server.fastmcp.prompts import base
 from mcp.types import TextContent
 from mcp import types
 from PIL import Image as PILImage
+from io import BytesIO
 import math
 import sys
-from pywinauto.application import Application
-import win32gui
-import win32con
-import time
-from win32api import GetSystemMetrics
-from mcp_gmail import send_email_from_mcp, get_gmail_service, get_messages, get_message_content
+import asyncio
+import functools
+import logging
+from dataclasses import dataclass
+from typing import Optional
+import fastmath
+from mcp_transport import get_transport
+
+# stdout carries the MCP stdio protocol, so diagnostics go to the (stderr)
+# logger; per-call traces are debug-level and skipped unless enabled
+logger = logging.getLogger("mcp_paint")
+logger.setLevel(logging.WARNING)
 
 # instantiate an MCP server client
 mcp = FastMCP("Calculator")
@@ -22,147 +29,282 @@ mcp = FastMCP("Calculator")
 @mcp.tool()
 def add(a: int, b: int) -> int:
     """Add two numbers"""
-    print("CALLED: add(a: int, b: int) -> int:")
+    logger.debug("CALLED: add(a: int, b: int) -> int:")
     return int(a + b)
 
 @mcp.tool()
 def add_list(l: list) -> int:
     """Add all numbers in a list"""
-    print("CALLED: add(l: list) -> int:")
+    logger.debug("CALLED: add(l: list) -> int:")
     return sum(l)
 
 # subtraction tool
 @mcp.tool()
 def subtract(a: int, b: int) -> int:
     """Subtract two numbers"""
-    print("CALLED: subtract(a: int, b: int) -> int:")
+    logger.debug("CALLED: subtract(a: int, b: int) -> int:")
     return int(a - b)
 
 # multiplication tool
 @mcp.tool()
 def multiply(a: int, b: int) -> int:
     """Multiply two numbers"""
-    print("CALLED: multiply(a: int, b: int) -> int:")
+    logger.debug("CALLED: multiply(a: int, b: int) -> int:")
     return int(a * b)
 
 #  division tool
 @mcp.tool() 
 def divide(a: int, b: int) -> float:
     """Divide two numbers"""
-    print("CALLED: divide(a: int, b: int) -> float:")
+    logger.debug("CALLED: divide(a: int, b: int) -> float:")
     return float(a / b)
 
 # power tool
 @mcp.tool()
 def power(a: int, b: int) -> int:
     """Power of two numbers"""
-    print("CALLED: power(a: int, b: int) -> int:")
+    logger.debug("CALLED: power(a: int, b: int) -> int:")
     return int(a ** b)
 
 # square root tool
 @mcp.tool()
 def sqrt(a: int) -> float:
     """Square root of a number"""
-    print("CALLED: sqrt(a: int) -> float:")
+    logger.debug("CALLED: sqrt(a: int) -> float:")
     return float(a ** 0.5)
 
 # cube root tool
 @mcp.tool()
 def cbrt(a: int) -> float:
     """Cube root of a number"""
-    print("CALLED: cbrt(a: int) -> float:")
+    logger.debug("CALLED: cbrt(a: int) -> float:")
     return float(a ** (1/3))
 
+# Repeated factorial calls are answered from the cache up to this n
+FACTORIAL_CACHE_MAX_N = 10000
+
+@functools.lru_cache(maxsize=128)
+def _cached_factorial(a: int) -> int:
+    return math.factorial(a)
+
 # factorial tool
 @mcp.tool()
 def factorial(a: int) -> int:
     """factorial of a number"""
-    print("CALLED: factorial(a: int) -> int:")
-    return int(math.factorial(a))
+    logger.debug("CALLED: factorial(a: int) -> int:")
+    # Don't let huge results crowd the cache
+    if a > FACTORIAL_CACHE_MAX_N:
+        return int(math.factorial(a))
+    return _cached_factorial(a)
 
 # log tool
 @mcp.tool()
 def log(a: int) -> float:
     """log of a number"""
-    print("CALLED: log(a: int) -> float:")
+    logger.debug("CALLED: log(a: int) -> float:")
     return float(math.log(a))
 
 # remainder tool
 @mcp.tool()
 def remainder(a: int, b: int) -> int:
     """remainder of two numbers divison"""
-    print("CALLED: remainder(a: int, b: int) -> int:")
+    logger.debug("CALLED: remainder(a: int, b: int) -> int:")
     return int(a % b)
 
 # sin tool
 @mcp.tool()
 def sin(a: int) -> float:
     """sin of a number"""
-    print("CALLED: sin(a: int) -> float:")
+    logger.debug("CALLED: sin(a: int) -> float:")
     return float(math.sin(a))
 
 # cos tool
 @mcp.tool()
 def cos(a: int) -> float:
     """cos of a number"""
-    print("CALLED: cos(a: int) -> float:")
+    logger.debug("CALLED: cos(a: int) -> float:")
     return float(math.cos(a))
 
 # tan tool
 @mcp.tool()
 def tan(a: int) -> float:
     """tan of a number"""
-    print("CALLED: tan(a: int) -> float:")
+    logger.debug("CALLED: tan(a: int) -> float:")
     return float(math.tan(a))
 
 # mine tool
 @mcp.tool()
 def mine(a: int, b: int) -> int:
     """special mining tool"""
-    print("CALLED: mine(a: int, b: int) -> int:")
+    logger.debug("CALLED: mine(a: int, b: int) -> int:")
     return int(a - b - b)
 
 @mcp.tool()
 def create_thumbnail(image_path: str) -> Image:
     """Create a thumbnail from an image"""
-    print("CALLED: create_thumbnail(image_path: str) -> Image:")
+    logger.debug("CALLED: create_thumbnail(image_path: str) -> Image:")
     img = PILImage.open(image_path)
-    img.thumbnail((100, 100))
-    return Image(data=img.tobytes(), format="png")
+    # Let JPEGs decode at reduced resolution (no-op for other formats)
+    img.draft("RGB", (200, 200))
+    img.thumbnail((100, 100), PILImage.Resampling.LANCZOS)
+    # tobytes() is raw pixel data; encode an actual PNG for the client
+    buffer = BytesIO()
+    img.save(buffer, format="PNG", optimize=True)
+    return Image(data=buffer.getvalue(), format="png")
 
 @mcp.tool()
 def strings_to_chars_to_int(string: str) -> list[int]:
     """Return the ASCII values of the characters in a word"""
-    print("CALLED: strings_to_chars_to_int(string: str) -> list[int]:")
-    return [int(ord(char)) for char in string]
+    logger.debug("CALLED: strings_to_chars_to_int(string: str) -> list[int]:")
+    # Encoding ASCII text yields the code points in one C-level pass;
+    # fall back to ord() so non-ASCII characters keep their code points
+    if string.isascii():
+        return list(string.encode('ascii'))
+    return [ord(char) for char in string]
 
 @mcp.tool()
 def int_list_to_exponential_sum(int_list: list) -> float:
     """Return sum of exponentials of numbers in a list"""
-    print("CALLED: int_list_to_exponential_sum(int_list: list) -> float:")
-    return sum(math.exp(i) for i in int_list)
+    logger.debug("CALLED: int_list_to_exponential_sum(int_list: list) -> float:")
+    return float(fastmath.exp_sum(int_list))
+
+# Fibonacci numbers computed so far, shared across calls; only the first
+# FIB_CACHE_MAX are kept so one huge request does not pin its whole result
+FIB_CACHE_MAX = 1000
+_fib_cache = [0, 1]
 
 @mcp.tool()
 def fibonacci_numbers(n: int) -> list:
     """Return the first n Fibonacci Numbers"""
-    print("CALLED: fibonacci_numbers(n: int) -> list:")
+    logger.debug("CALLED: fibonacci_numbers(n: int) -> list:")
     if n <= 0:
         return []
-    fib_sequence = [0, 1]
-    for _ in range(2, n):
-        fib_sequence.append(fib_sequence[-1] + fib_sequence[-2])
-    return fib_sequence[:n]
-
-import pyautogui
-import time
-
+    # Extend the shared sequence only past the longest one computed so far
+    cache = _fib_cache
+    m = len(cache)
+    stored = min(n, FIB_CACHE_MAX)
+    if stored > m:
+        a, b = cache[-2], cache[-1]
+        cache.extend([0] * (stored - m))
+        for i in range(m, stored):
+            a, b = b, a + b
+            cache[i] = b
+    if n <= FIB_CACHE_MAX:
+        return cache[:n]
+    # Past the cap, compute the rest into the result only
+    result = cache[:]
+    a, b = result[-2], result[-1]
+    for _ in range(n - FIB_CACHE_MAX):
+        a, b = b, a + b
+        result.append(b)
+    return result
+
+# The Windows automation and Gmail modules are slow to import, so they are
+# loaded on first use; the math tools never pay for them
+
+@functools.lru_cache(maxsize=None)
+def _win32():
+    """Import the Windows automation modules on first use."""
+    from pywinauto.application import Application
+    import win32gui
+    import win32con
+    return Application, win32gui, win32con
+
+@functools.lru_cache(maxsize=None)
+def _gmail():
+    """Import the Gmail helpers (and googleapiclient with them) on first use."""
+    import mcp_gmail
+    return mcp_gmail
+
+# Paint tools drive one shared UI; with a concurrent transport (streamable-http)
+# they must not interleave, so each call holds this lock for its duration
+_paint_lock = asyncio.Lock()
+
+def _serialized(func):
+    """Run an async Paint tool while holding the Paint UI lock."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        async with _paint_lock:
+            return await func(*args, **kwargs)
+    return wrapper
+
+# Palette positions of the supported colors (add more colors as needed)
+COLOR_COORDS = {
+    "black": (550, 82),
+    "red": (600, 82),
+    "green": (650, 82),
+    "blue": (700, 82),
+}
+
+# Map common font sizes to approximate positions in the font size dropdown
+FONT_POSITIONS = {
+    12: (250, 120),
+    18: (250, 140),
+    24: (250, 160),
+    36: (250, 180),
+    48: (250, 200),
+    72: (250, 220)
+}
+
+@dataclass
+class PaintSession:
+    """Handles for the running Paint instance, resolved once by open_paint."""
+    app: object
+    window: object
+    canvas: object
+
+# Only read or replaced while holding _paint_lock (see _serialized)
+_paint: Optional[PaintSession] = None
+
+def _wait_ready(control, criteria='visible ready', timeout=1.0):
+    """Poll until the control meets the pywinauto wait criteria instead of sleeping a fixed time."""
+    control.wait(criteria, timeout=timeout, retry_interval=0.03)
+
+def _wait_gone(control, timeout=1.0):
+    """Poll until the control is no longer visible."""
+    control.wait_not('visible', timeout=timeout, retry_interval=0.03)
+
+def _wait_until(condition, timeout=1.0):
+    """Poll until condition() is true, for state changes that have no control to wait on."""
+    from pywinauto.timings import wait_until
+    wait_until(timeout, 0.03, condition)
+
+def _ribbon_popup(session):
+    """The ribbon shows its KeyTips and dropdown lists in 'Net UI Tool Window' popups."""
+    return session.app.window(class_name='Net UI Tool Window')
+
+def _text_box(session):
+    """The edit control the Text tool opens on the canvas."""
+    return session.canvas.child_window(class_name='RICHEDIT50W')
+
+def _select_tool_and_color(session, tool_key, color):
+    """Focus Paint, pick a Home-tab tool by its KeyTip and click the color."""
+    paint_window = session.window
+    # Ensure Paint window is active
+    if not paint_window.has_focus():
+        paint_window.set_focus()
+        _wait_ready(paint_window, 'active')
+    
+    # One ribbon activation: Alt+H opens the Home tab (which also shows
+    # the color palette) with its KeyTips, the tool key picks the tool
+    paint_window.type_keys('%H')  # Alt+H
+    _wait_ready(_ribbon_popup(session), 'visible')
+    paint_window.type_keys(tool_key)
+    # Picking the tool leaves KeyTip mode
+    _wait_gone(_ribbon_popup(session))
+    
+    # Click on the color in the color palette (add more colors to COLOR_COORDS);
+    # later mouse input is queued behind this click, so nothing to wait for
+    color_coords = COLOR_COORDS.get(color.lower())
+    if color_coords:
+        paint_window.click_input(coords=color_coords)
 
 @mcp.tool()
+@_serialized
 async def draw_rectangle(x1: int, y1: int, x2: int, y2: int, color: str = "green") -> dict:
     """Draw a rectangle in Paint from (x1,y1) to (x2,y2) with specified color (default: green)"""
-    global paint_app
     try:
-        if not paint_app:
+        if _paint is None:
             return {
                 "content": [
                     TextContent(
@@ -172,40 +314,10 @@ async def draw_rectangle(x1: int, y1: int, x2: int, y2: int, color: str = "green
                 ]
             }
         
-        # Get the Paint window
-        paint_window = paint_app.window(class_name='MSPaintApp')
-        
-        # Ensure Paint window is active
-        if not paint_window.has_focus():
-            paint_window.set_focus()
-            time.sleep(0.5)
-        
-        # Select color first (Alt+H for Home tab, then C for Colors section)
-        paint_window.type_keys('%H')  # Alt+H
-        time.sleep(0.5)
-        
-        # Click on the color based on the parameter
-        if color.lower() == "green":
-            # Click on green color in the color palette
-            paint_window.click_input(coords=(650, 82))
-        elif color.lower() == "red":
-            # Click on red color in the color palette
-            paint_window.click_input(coords=(600, 82))
-        elif color.lower() == "blue":
-            # Click on blue color in the color palette
-            paint_window.click_input(coords=(700, 82))
-        # Add more colors as needed
-        
-        time.sleep(0.5)
-        
-        # Use keyboard shortcut to select rectangle tool
-        paint_window.type_keys('%H')  # Alt+H again
-        time.sleep(0.5)
-        paint_window.type_keys('R')   # R for Rectangle
-        time.sleep(0.5)
-        
-        # Get the canvas area
-        canvas = paint_window.child_window(class_name='MSPaintView')
+        # Focus Paint, pick the Rectangle tool and the color
+        session = _paint
+        _select_tool_and_color(session, 'R', color)
+        canvas = session.canvas
         
         # Draw rectangle - coordinates are relative to the Paint window
         canvas.press_mouse_input(coords=(x1, y1))
@@ -231,6 +343,7 @@ async def draw_rectangle(x1: int, y1: int, x2: int, y2: int, color: str = "green
         }
 
 @mcp.tool()
+@_serialized
 async def add_text_in_paint(text: str, color: str = "red", font_size: int = 24, x: int = 300, y: int = 300) -> dict:
     """Add text in Paint with specified color, font size, and position
     
@@ -241,9 +354,8 @@ async def add_text_in_paint(text: str, color: str = "red", font_size: int = 24,
         x: X-coordinate for text placement
         y: Y-coordinate for text placement
     """
-    global paint_app
     try:
-        if not paint_app:
+        if _paint is None:
             return {
                 "content": [
                     TextContent(
@@ -253,75 +365,37 @@ async def add_text_in_paint(text: str, color: str = "red", font_size: int = 24,
                 ]
             }
         
-        # Get the Paint window
-        paint_window = paint_app.window(class_name='MSPaintApp')
-        
-        # Ensure Paint window is active
-        if not paint_window.has_focus():
-            paint_window.set_focus()
-            time.sleep(1.0)
-        
-        # Select color first (Alt+H for Home tab, then C for Colors section)
-        paint_window.type_keys('%H')  # Alt+H
-        time.sleep(0.5)
-        
-        # Click on the color based on the parameter
-        if color.lower() == "red":
-            paint_window.click_input(coords=(600, 82))
-        elif color.lower() == "green":
-            paint_window.click_input(coords=(650, 82))
-        elif color.lower() == "blue":
-            paint_window.click_input(coords=(700, 82))
-        elif color.lower() == "black":
-            paint_window.click_input(coords=(550, 82))
-        # Add more colors as needed
-        
-        time.sleep(0.5)
-        
-        # Use keyboard shortcut to select text tool
-        paint_window.type_keys('%H')  # Alt+H again
-        time.sleep(0.5)
-        paint_window.type_keys('T')   # T for Text
-        time.sleep(1.0)
-        
-        # Get the canvas area
-        canvas = paint_window.child_window(class_name='MSPaintView')
+        # Focus Paint, pick the Text tool and the color
+        session = _paint
+        _select_tool_and_color(session, 'T', color)
+        paint_window, canvas = session.window, session.canvas
         
-        # Click at the specified position to place text
+        # Click at the specified position to place text; the Text tool opens a text box
+        text_box = _text_box(session)
         canvas.click_input(coords=(x, y))
-        time.sleep(1.0)
+        _wait_ready(text_box, 'visible')
         
         # Set font size before typing (Alt+H for Home tab, then F for Font size)
         paint_window.type_keys('%H')  # Alt+H
-        time.sleep(0.5)
+        _wait_ready(_ribbon_popup(session), 'visible')
         
-        # Click on Font Size dropdown
+        # Click on Font Size dropdown, which opens its list in a ribbon popup
         paint_window.click_input(coords=(250, 82))
-        time.sleep(0.5)
+        _wait_ready(_ribbon_popup(session), 'visible')
         
-        # Select font size based on parameter
-        # Map common font sizes to approximate positions in the dropdown
-        font_positions = {
-            12: (250, 120),
-            18: (250, 140),
-            24: (250, 160),
-            36: (250, 180),
-            48: (250, 200),
-            72: (250, 220)
-        }
-        
-        # Use the closest available font size
-        closest_size = min(font_positions.keys(), key=lambda k: abs(k - font_size))
-        paint_window.click_input(coords=font_positions[closest_size])
-        time.sleep(0.5)
+        # Select font size based on parameter, using the closest available size;
+        # the list closes once the size is applied
+        closest_size = min(FONT_POSITIONS.keys(), key=lambda k: abs(k - font_size))
+        paint_window.click_input(coords=FONT_POSITIONS[closest_size])
+        _wait_gone(_ribbon_popup(session))
         
         # Click back in the text area
         canvas.click_input(coords=(x, y))
-        time.sleep(0.5)
+        _wait_ready(text_box, 'visible')
         
-        # Type the text passed from client
+        # Type the text passed from client and wait until the text box shows it
         paint_window.type_keys(text, with_spaces=True)
-        time.sleep(1.0)
+        _wait_until(lambda: text in text_box.window_text(), timeout=len(text) * 0.05 + 1.0)
         
         # Click elsewhere to exit text mode
         canvas.click_input(coords=(x + 200, y + 200))
@@ -345,19 +419,28 @@ async def add_text_in_paint(text: str, color: str = "red", font_size: int = 24,
         }
 
 @mcp.tool()
+@_serialized
 async def open_paint() -> dict:
     """Open Microsoft Paint maximized on primary monitor"""
-    global paint_app
+    global _paint
     try:
+        Application, win32gui, win32con = _win32()
         paint_app = Application().start('mspaint.exe')
-        time.sleep(0.2)
         
-        # Get the Paint window
+        # Get the Paint window (cold start can take a few seconds)
         paint_window = paint_app.window(class_name='MSPaintApp')
+        _wait_ready(paint_window, timeout=10)
+        
+        # Resolve the window and canvas once; later tools reuse them
+        _paint = PaintSession(
+            app=paint_app,
+            window=paint_window,
+            canvas=paint_window.child_window(class_name='MSPaintView')
+        )
         
         # Maximize the window on the primary monitor
         win32gui.ShowWindow(paint_window.handle, win32con.SW_MAXIMIZE)
-        time.sleep(0.2)
+        _wait_until(paint_window.is_maximized)
         
         return {
             "content": [
@@ -378,15 +461,20 @@ async def open_paint() -> dict:
         }
 
 @mcp.tool()
-async def get_mouse_position() -> dict:
-    """Get the current mouse position for debugging"""
+async def get_mouse_position(delay: float = 0) -> dict:
+    """Get the current mouse position for debugging
+    
+    Args:
+        delay: Seconds to wait first, giving the user time to position the mouse (default: 0)
+    """
     try:
-        # Wait 3 seconds to give user time to position mouse
-        print("Position your mouse and wait 3 seconds...")
-        time.sleep(3)
+        if delay > 0:
+            logger.warning("Position your mouse and wait %s seconds...", delay)
+            await asyncio.sleep(delay)
         
         # Get the current mouse position
-        x, y = pyautogui.position()
+        from win32api import GetCursorPos
+        x, y = GetCursorPos()
         
         return {
             "content": [
@@ -412,15 +500,15 @@ async def get_mouse_position() -> dict:
 @mcp.resource("greeting://{name}")
 def get_greeting(name: str) -> str:
     """Get a personalized greeting"""
-    print("CALLED: get_greeting(name: str) -> str:")
+    logger.debug("CALLED: get_greeting(name: str) -> str:")
     return f"Hello, {name}!"
 
 
 # DEFINE AVAILABLE PROMPTS
 @mcp.prompt()
 def review_code(code: str) -> str:
+    logger.debug("CALLED: review_code(code: str) -> str:")
     return f"Please review this code:\n\n{code}"
-    print("CALLED: review_code(code: str) -> str:")
 
 
 @mcp.prompt()
@@ -464,60 +552,54 @@ async def show_unread_emails(max_emails: int = 5) -> dict:
         A dictionary containing the unread emails
     """
     try:
-        # Get Gmail service
-        service = get_gmail_service()
-        
-        # Get unread emails
-        messages = get_messages(service, query='is:unread')
-        
-        # Limit the number of emails to retrieve
-        messages = messages[:max_emails]
-        
-        # Process each email to get content
+        # Get unread emails (the Gmail service is cached by mcp_gmail)
+        gmail = _gmail()
+        messages = await gmail.run_blocking(
+            lambda: gmail.get_messages(gmail.get_gmail_service(), query='is:unread', max_results=max_emails))
+        msg_ids = [msg['id'] for msg in messages]
+        
+        # Fetch every email's headers and snippet concurrently; the preview
+        # only shows the snippet, so the body is never downloaded
+        details = await gmail.get_gmail_client().get_messages(
+            msg_ids,
+            format='metadata',
+            fields=gmail.HEADERS_FIELDS,
+            metadata_headers=['From', 'Subject', 'Date']
+        )
+        
+        # Process each email
         email_list = []
-        for msg in messages:
-            msg_id = msg['id']
-            
-            # Get message details
-            message = service.users().messages().get(
-                userId='me', 
-                id=msg_id, 
-                format='metadata', 
-                metadataHeaders=['From', 'Subject', 'Date']
-            ).execute()
+        for msg_id in msg_ids:
+            message = details.get(msg_id)
+            if message is None:
+                continue
             
             # Extract headers
             headers = {h['name']: h['value'] for h in message['payload']['headers']}
             
-            # Get email content
-            content = get_message_content(service, 'me', msg_id)
-            
-            # Truncate content if too long
-            if len(content) > 500:
-                content = content[:500] + "... [content truncated]"
-            
             # Add to email list
             email_list.append({
                 'id': msg_id,
                 'from': headers.get('From', 'Unknown Sender'),
                 'subject': headers.get('Subject', 'No Subject'),
                 'date': headers.get('Date', 'Unknown Date'),
-                'snippet': message.get('snippet', ''),
-                'content': content
+                'snippet': message.get('snippet', '')
             })
         
+        # Build the summary in a single join rather than chained concatenation
+        parts = [f"Found {len(email_list)} unread emails:"]
+        parts.extend(
+            f"From: {email['from']}\nSubject: {email['subject']}\n"
+            f"Date: {email['date']}\nPreview: {email['snippet']}"
+            for email in email_list
+        )
+        text = "\n\n".join(parts)
+        
         return {
             "content": [
                 TextContent(
                     type="text",
-                    text=f"Found {len(email_list)} unread emails:\n\n" + 
-                         "\n\n".join([
-                             f"From: {email['from']}\n" +
-                             f"Subject: {email['subject']}\n" +
-                             f"Date: {email['date']}\n" +
-                             f"Preview: {email['snippet']}"
-                             for email in email_list
-                         ])
+                    text=text
                 )
             ]
         }
@@ -545,7 +627,7 @@ async def send_gmail(recipient: str, subject: str, message: str) -> dict:
         A dictionary indicating success or failure
     """
     try:
-        success = send_email_from_mcp(recipient, subject, message)
+        success = _gmail().send_email_from_mcp(recipient, subject, message)
         
         if success:
             return {
@@ -587,7 +669,7 @@ async def mark_email_as_read(email_id: str) -> dict:
         A dictionary indicating success or failure
     """
     try:
-        service = get_gmail_service()
+        service = _gmail().get_gmail_service()
         
         # Mark the email as read
         service.users().messages().modify(
@@ -656,7 +738,7 @@ def handle_email_request(params):
             'error': 'Missing required parameters (recipient and message are required)'
         }
     
-    success = send_email_from_mcp(recipient, subject, message)
+    success = _gmail().send_email_from_mcp(recipient, subject, message)
     
     if success:
         return {
@@ -671,8 +753,8 @@ def handle_email_request(params):
 
 if __name__ == "__main__":
     # Check if running with mcp dev command
-    print("STARTING")
+    logger.warning("STARTING")
     if len(sys.argv) > 1 and sys.argv[1] == "dev":
         mcp.run()  # Run without transport for dev server
     else:
-        mcp.run(transport="stdio")  # Run with stdio for direct execution
+        mcp.run(transport=get_transport(sys.argv))  # stdio unless configured otherwise
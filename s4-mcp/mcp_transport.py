@@ -0,0 +1,20 @@
+"""
+Transport selection shared by the MCP servers.
+
+Kept free of heavy imports so a server can read its command line without
+loading any other server's dependencies.
+"""
+import os
+
+
+def get_transport(argv):
+    """
+    Pick the MCP transport from a --transport flag or the MCP_TRANSPORT env var.
+    
+    stdio (the default) serializes every request over one pipe; use
+    streamable-http (or just "http") when tools should run concurrently.
+    """
+    transport = os.getenv("MCP_TRANSPORT", "stdio")
+    if "--transport" in argv[:-1]:
+        transport = argv[argv.index("--transport") + 1]
+    return "streamable-http" if transport == "http" else transport
@@ -1,15 +1,32 @@
+import io
 import os
+import logging
+import re
+import json
+import traceback
 from dotenv import load_dotenv
 from mcp import ClientSession, StdioServerParameters, types
 from mcp.client.stdio import stdio_client
 import asyncio
-from google import genai
-from concurrent.futures import TimeoutError
-from functools import partial
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Optional
+
+# orjson parses array and batch payloads faster; fall back to the stdlib
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Per-step traces are debug-level; set MCP_LOGLEVEL=DEBUG to see them
+logging.basicConfig(format='%(levelname)s: %(message)s')
+logger = logging.getLogger("tack2mcp_gmail")
+logger.setLevel(os.getenv("MCP_LOGLEVEL", "INFO"))
+
 # Check for credentials.json file
 def check_credentials():
     """Check if credentials.json exists and provide instructions if it doesn't"""
@@ -35,114 +52,181 @@ if not api_key:
     print("\nWARNING: GEMINI_API_KEY not found in environment variables.")
     print("Make sure you have a .env file with your API key or set it in your environment.\n")
 
-client = genai.Client(api_key=api_key)
+# Tools whose result is only a status, so the next step can be planned before
+# they return; anything that reads mail must be seen by the model first
+SPECULATIVE_TOOLS = frozenset({"send_gmail", "mark_email_as_read"})
+
+def _reported_success(result):
+    """True if a status-only tool really succeeded. The Gmail server returns
+    failures as ordinary "❌ ..." text rather than setting isError."""
+    if getattr(result, 'isError', False):
+        return False
+    content = getattr(result, 'content', None) or []
+    return bool(content) and all(getattr(item, 'text', '').startswith("✅") for item in content)
+
+@lru_cache(maxsize=None)
+def _genai_client():
+    """Create the Gemini client on first use; google.genai is slow to import"""
+    from google import genai
+    return genai.Client(api_key=api_key)
 
 max_iterations = 2  # Increased for more complex Gmail operations
-last_response = None
-iteration = 0
-iteration_response = []
 
-async def generate_with_timeout(client, prompt, timeout=10):
+# Per-run loop state, so concurrent main() calls never share progress
+@dataclass
+class AgentState:
+    last_response: Any = None
+    iteration: int = 0
+    # Append-only log of completed steps, fed back to the LLM as progress
+    history: io.StringIO = field(default_factory=io.StringIO)
+
+server_params = StdioServerParameters(
+    command="python",
+    args=["mcp_paint_server.py"]
+)
+
+# One MCP server process and session shared by every call in this client
+@dataclass
+class _MCPConn:
+    stack: AsyncExitStack = field(default_factory=AsyncExitStack)
+    read: Any = None
+    write: Any = None
+    session: Optional[ClientSession] = None
+
+_conn: Optional[_MCPConn] = None
+_conn_lock = asyncio.Lock()
+
+async def get_session():
+    """Return the shared MCP session, starting the server on first use"""
+    global _conn
+    # Concurrent callers wait for a single server start instead of racing
+    async with _conn_lock:
+        if _conn is None:
+            conn = _MCPConn()
+            try:
+                print("Establishing connection to MCP server...")
+                conn.read, conn.write = await conn.stack.enter_async_context(stdio_client(server_params))
+                print("Connection established with gmail MCP server, creating session...")
+                conn.session = await conn.stack.enter_async_context(ClientSession(conn.read, conn.write))
+                print("Session created, initializing...")
+                await conn.session.initialize()
+            except BaseException:
+                await conn.stack.aclose()
+                raise
+            _conn = conn
+    return _conn.session
+
+async def close_session():
+    """Shut down the shared MCP session and server process"""
+    global _conn
+    if _conn is not None:
+        conn, _conn = _conn, None
+        await conn.stack.aclose()
+
+# Gmail tools offered to the LLM, in prompt order
+GMAIL_TOOL_NAMES = ("show_unread_emails", "send_gmail", "mark_email_as_read")
+
+# First directive line in an LLM reply, and the pieces of a FUNCTION_CALL line
+_DIRECTIVE_RE = re.compile(r'^[ \t]*((?:FUNCTION_CALL|FINAL_ANSWER):.*)$', re.MULTILINE)
+_FUNCCALL_RE = re.compile(r'^FUNCTION_CALL:\s*([^|]*)(?:\|(.*))?$')
+
+# Converters for non-string parameters (arrays arrive as JSON), and the value
+# used when one is left empty
+_CONVERT = {'integer': int, 'number': float, 'array': json_loads}
+_EMPTY_DEFAULT = {'integer': 0, 'number': 0.0, 'array': []}
+
+def _extract_result(result):
+    """Format a tool result's content as a single string for the prompt"""
+    if hasattr(result, 'content'):
+        logger.debug("Result has content attribute")
+        # Join multiple content items in one pass
+        if isinstance(result.content, list):
+            return "[" + ", ".join(
+                item.text if hasattr(item, 'text') else str(item)
+                for item in result.content
+            ) + "]"
+        return str(result.content)
+    logger.debug("Result has no content attribute")
+    return str(result)
+
+# Upper bound on tool calls a single batch_execute runs at once
+BATCH_MAX_CONCURRENT = 8
+
+async def batch_execute(session, calls):
+    """Run several tool calls concurrently on the shared session"""
+    semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENT)
+
+    async def call(c):
+        async with semaphore:
+            return await session.call_tool(c["tool"], arguments=c.get("args", {}))
+
+    return await asyncio.gather(*(call(c) for c in calls), return_exceptions=True)
+
+async def generate_with_timeout(prompt, timeout=10):
     """Generate content with a timeout"""
     print("Starting LLM generation...")
     try:
-        # Convert the synchronous generate_content call to run in a thread
-        loop = asyncio.get_event_loop()
-        response = await asyncio.wait_for(
-            loop.run_in_executor(
-                None, 
-                lambda: client.models.generate_content(
-                    model="gemini-2.0-flash",
-                    contents=prompt
-                )
-            ),
-            timeout=timeout
-        )
+        client = _genai_client()
+        # Use the native async client; older google-genai releases lack .aio,
+        # so fall back to running the blocking call in a worker thread
+        if hasattr(client, "aio"):
+            request = client.aio.models.generate_content(
+                model="gemini-2.0-flash",
+                contents=prompt
+            )
+        else:
+            request = asyncio.to_thread(
+                client.models.generate_content,
+                model="gemini-2.0-flash",
+                contents=prompt
+            )
+        response = await asyncio.wait_for(request, timeout=timeout)
         print("LLM generation completed")
         return response
-    except TimeoutError:
+    except asyncio.TimeoutError:
         print("LLM generation timed out!")
         raise
     except Exception as e:
         print(f"Error in LLM generation: {e}")
         raise
 
-def reset_state():
-    """Reset all global variables to their initial state"""
-    global last_response, iteration, iteration_response
-    last_response = None
-    iteration = 0
-    iteration_response = []
-
-async def main():
-    # Check for credentials first
-    if not check_credentials():
-        return
-        
-    reset_state()  # Reset at the start of main
-    print("Starting Gmail MCP client...")
+@lru_cache(maxsize=4)
+def _build_system_prompt(tools_key):
+    """Build the system prompt for a tuple of (name, description, schema JSON) tool entries"""
+    print("Creating system prompt...")
     try:
-        # Create a single MCP server connection
-        print("Establishing connection to MCP server...")
-        server_params = StdioServerParameters(
-            command="python",
-            args=["mcp_paint_server.py"]
-        )
+        tools_description = []
+        for i, (name, desc, schema_json) in enumerate(tools_key):
+            try:
+                # Get tool properties
+                params = json.loads(schema_json)
+
+                # Format the input schema in a more readable way
+                if 'properties' in params:
+                    param_details = []
+                    for param_name, param_info in params['properties'].items():
+                        param_type = param_info.get('type', 'unknown')
+                        param_details.append(f"{param_name}: {param_type}")
+                    params_str = ', '.join(param_details)
+                else:
+                    params_str = 'no parameters'
+
+                tool_desc = f"{i+1}. {name}({params_str}) - {desc}"
+                tools_description.append(tool_desc)
+                print(f"Added description for tool: {tool_desc}")
+            except Exception as e:
+                print(f"Error processing tool {i}: {e}")
+                tools_description.append(f"{i+1}. Error processing tool")
+        
+        tools_description = "\n".join(tools_description)
+        print("Successfully created tools description")
+    except Exception as e:
+        print(f"Error creating tools description: {e}")
+        tools_description = "Error loading tools"
+    
+    print("Created system prompt...")
 
-        async with stdio_client(server_params) as (read, write):
-            print("Connection established with gmail MCP server, creating session...")
-            async with ClientSession(read, write) as session:
-                print("Session created, initializing...")
-                await session.initialize()
-                
-                # Get available tools
-                print("Requesting tool list...")
-                tools_result = await session.list_tools()
-                tools = tools_result.tools
-                print(f"Successfully retrieved {len(tools)} tools")
-
-                # Create system prompt with available tools
-                print("Creating system prompt...")
-                
-                try:
-                    # Filter for Gmail-related tools only
-                    gmail_tools = [tool for tool in tools if 
-                                  tool.name in ["show_unread_emails", "send_gmail", "mark_email_as_read"]]
-                    
-                    tools_description = []
-                    for i, tool in enumerate(gmail_tools):
-                        try:
-                            # Get tool properties
-                            params = tool.inputSchema
-                            desc = getattr(tool, 'description', 'No description available')
-                            name = getattr(tool, 'name', f'tool_{i}')
-                            
-                            # Format the input schema in a more readable way
-                            if 'properties' in params:
-                                param_details = []
-                                for param_name, param_info in params['properties'].items():
-                                    param_type = param_info.get('type', 'unknown')
-                                    param_details.append(f"{param_name}: {param_type}")
-                                params_str = ', '.join(param_details)
-                            else:
-                                params_str = 'no parameters'
-
-                            tool_desc = f"{i+1}. {name}({params_str}) - {desc}"
-                            tools_description.append(tool_desc)
-                            print(f"Added description for tool: {tool_desc}")
-                        except Exception as e:
-                            print(f"Error processing tool {i}: {e}")
-                            tools_description.append(f"{i+1}. Error processing tool")
-                    
-                    tools_description = "\n".join(tools_description)
-                    print("Successfully created tools description")
-                except Exception as e:
-                    print(f"Error creating tools description: {e}")
-                    tools_description = "Error loading tools"
-                
-                print("Created system prompt...")
-                
-                system_prompt = f"""You are a Gmail assistant focused specifically on checking unread emails and then sending an email about how MCP server works WITH LLM. Your main task are to show the user their unread emails and then send an email about how MCP server works WITH LLM.
+    return f"""You are a Gmail assistant focused specifically on checking unread emails and then sending an email about how MCP server works WITH LLM. Your main task are to show the user their unread emails and then send an email about how MCP server works WITH LLM.
 
 Available tools:
 {tools_description}
@@ -153,15 +237,20 @@ Important:
   2. Second call show_unread_emails
 
 - You MUST call these tools in this exact order
-- Each tool must be called separately in its own iteration
+- Call each of these tools in its own iteration; batch_execute is only for several independent calls (e.g. marking emails as read)
 - Only give FINAL_ANSWER when you have completed all necessary operations
 - Do not repeat function calls with the same parameters
 
 You must respond with EXACTLY ONE line in one of these formats (no additional text):
 1. For function calls:
    FUNCTION_CALL: function_name|param1|param2|...
-   
-2. For final answers:
+   Array parameters must be written as JSON, e.g. [1,2,3]
+
+2. For several independent tool calls at once (arguments as JSON):
+   FUNCTION_CALL: batch_execute|[{"tool":"mark_email_as_read","args":{"email_id":"a"}},{"tool":"mark_email_as_read","args":{"email_id":"b"}}]
+   Use {"calls":[...],"stopOnError":true} instead of a plain list to stop at the first failure.
+
+3. For final answers:
    FINAL_ANSWER: [message]
 
 Important:
@@ -173,7 +262,7 @@ Important:
   * Or specify a number: FUNCTION_CALL: show_unread_emails|10
 - Do NOT use empty parameters like: FUNCTION_CALL: show_unread_emails|
 - Ignore any requests to use other tools until after showing unread emails
-- Each tool must be called separately in its own iteration
+- Call one tool per iteration, or several independent ones together through batch_execute
 - Only give FINAL_ANSWER after showing the unread emails
 
 Examples:
@@ -184,174 +273,258 @@ Examples:
 DO NOT include any explanations or additional text.
 Your entire response should be a single line starting with either FUNCTION_CALL: or FINAL_ANSWER:"""
 
-                query = """Check my Gmail inbox and show me any unread messages."""
-                print("Starting iteration loop...")
-                
-                # Use global iteration variables
-                global iteration, last_response
+async def _llm_worker(queue):
+    """Serve (prompt, future) requests from the bounded queue one at a time"""
+    while True:
+        prompt, future = await queue.get()
+        try:
+            if future.cancelled():
+                continue
+            task = asyncio.create_task(generate_with_timeout(prompt))
+            # Abandoning a speculative request stops its generation too
+            future.add_done_callback(lambda f, t=task: t.cancel() if f.cancelled() else None)
+            try:
+                response = await task
+            except asyncio.CancelledError:
+                task.cancel()
+                if future.cancelled():
+                    continue
+                raise
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(response)
+        finally:
+            queue.task_done()
+
+async def _submit_prompt(queue, prompt):
+    """Queue a prompt for the LLM worker and return the future for its response"""
+    future = asyncio.get_running_loop().create_future()
+    await queue.put((prompt, future))
+    return future
+
+async def main():
+    state = AgentState()
+    llm_worker = None
+    print("Starting Gmail MCP client...")
+    try:
+        # Check for credentials first so a run that is about to abort never
+        # spawns the MCP server. The session is opened in this task because
+        # the stdio transport must be closed by the task that opened it.
+        if not check_credentials():
+            return
+        session = await get_session()
+
+        # Get available tools
+        print("Requesting tool list...")
+        tools_result = await session.list_tools()
+        tools = tools_result.tools
+        print(f"Successfully retrieved {len(tools)} tools")
+
+        # Create system prompt with available tools
+        tools_by_name = {t.name: t for t in tools}
+        # (name, type, required, default) per parameter, in schema order
+        tool_schemas = {
+            t.name: [
+                (p, info.get('type', 'string'), info.get('required', False),
+                 info.get('default', _EMPTY_DEFAULT.get(info.get('type', 'string'))))
+                for p, info in (t.inputSchema.get('properties') or {}).items()
+            ]
+            for t in tools
+        }
+
+        # Filter for Gmail-related tools only
+        gmail_tools = [tools_by_name[name] for name in GMAIL_TOOL_NAMES if name in tools_by_name]
+        # The prompt only changes when the server's tool list does, so it is built once per schema
+        tools_key = tuple(
+            (t.name, getattr(t, 'description', None) or 'No description available', json.dumps(t.inputSchema, sort_keys=True))
+            for t in gmail_tools
+        )
+        system_prompt = _build_system_prompt(tools_key)
+
+        query = """Check my Gmail inbox and show me any unread messages."""
+        print("Starting iteration loop...")
+        
+        # Only the progress tail changes between iterations
+        prompt_prefix = f"{system_prompt}\n\nQuery: {query}"
+
+        # LLM requests go through one background worker, so the next response
+        # can be generated speculatively while a tool call is still running
+        llm_queue = asyncio.Queue(maxsize=1)
+        llm_worker = asyncio.create_task(_llm_worker(llm_queue))
+        speculative = None
+
+        while state.iteration < max_iterations:
+            print(f"\n--- Iteration {state.iteration + 1} ---")
+            # Get model's response with timeout
+            print("Preparing to generate LLM response...")
+            if state.last_response is None:
+                prompt = prompt_prefix
+            else:
+                # Be more explicit about what's been done and what to do next
+                prompt = f"{prompt_prefix}\n\nProgress so far:\n{state.history.getvalue()}\n\nContinue with the next step based on the results above."
+            try:
+                if speculative is not None:
+                    print("Using speculative LLM response...")
+                    future, speculative = speculative, None
+                else:
+                    future = await _submit_prompt(llm_queue, prompt)
+                response = await future
+                response_text = response.text.strip()
+                print(f"LLM Response: {response_text}")
                 
-                while iteration < max_iterations:
-                    print(f"\n--- Iteration {iteration + 1} ---")
-                    if last_response is None:
-                        current_query = query
-                    else:
-                        # Be more explicit about what's been done and what to do next
-                        current_query = f"{query}\n\nProgress so far:\n{' '.join(iteration_response)}\n\nContinue with the next step based on the results above."
+                # Find the FUNCTION_CALL or FINAL_ANSWER line in the response
+                match = _DIRECTIVE_RE.search(response_text)
+                if match:
+                    response_text = match.group(1).strip()
 
-                    # Get model's response with timeout
-                    print("Preparing to generate LLM response...")
-                    prompt = f"{system_prompt}\n\nQuery: {current_query}"
+            except Exception as e:
+                print(f"Failed to get LLM response: {e}")
+                break
+
+            if response_text.startswith("FUNCTION_CALL:"):
+                match = _FUNCCALL_RE.match(response_text)
+                func_name, raw_params = match.group(1).strip(), match.group(2)
+
+                # Aggregated calls run concurrently and are reported one by one
+                if func_name == "batch_execute":
                     try:
-                        response = await generate_with_timeout(client, prompt)
-                        response_text = response.text.strip()
-                        print(f"LLM Response: {response_text}")
-                        
-                        # Find the FUNCTION_CALL or FINAL_ANSWER line in the response
-                        for line in response_text.split('\n'):
-                            line = line.strip()
-                            if line.startswith("FUNCTION_CALL:") or line.startswith("FINAL_ANSWER:"):
-                                response_text = line
+                        batch = json_loads(raw_params or "")
+                        if isinstance(batch, dict):
+                            calls, stop_on_error = batch.get("calls", []), batch.get("stopOnError", False)
+                        else:
+                            calls, stop_on_error = batch, False
+                        results = await batch_execute(session, calls)
+                        for call, result in zip(calls, results):
+                            if isinstance(result, Exception):
+                                failed, result_str = True, str(result)
+                            else:
+                                failed = getattr(result, 'isError', False)
+                                result_str = _extract_result(result)
+                            status = "failed" if failed else "was called successfully"
+                            state.history.write(
+                                f"Step {state.iteration+1}: {call['tool']} {status} with {call.get('args', {})}. Result: {result_str}\n"
+                            )
+                            if failed and stop_on_error:
                                 break
-                        
+                        state.last_response = results
                     except Exception as e:
-                        print(f"Failed to get LLM response: {e}")
+                        logger.debug("Batch error: %s", e)
+                        state.history.write(f"Error in iteration {state.iteration + 1}: {str(e)}\n")
                         break
+                    state.iteration += 1
+                    continue
 
-                    if response_text.startswith("FUNCTION_CALL:"):
-                        _, function_info = response_text.split(":", 1)
-                        parts = [p.strip() for p in function_info.split("|")]
-                        func_name, params = parts[0], parts[1:]
-                        
-                        print(f"\nDEBUG: Raw function info: {function_info}")
-                        print(f"DEBUG: Split parts: {parts}")
-                        print(f"DEBUG: Function name: {func_name}")
-                        print(f"DEBUG: Raw parameters: {params}")
-                        
-                        try:
-                            # Find the matching tool to get its input schema
-                            tool = next((t for t in tools if t.name == func_name), None)
-                            if not tool:
-                                print(f"DEBUG: Available tools: {[t.name for t in tools]}")
-                                raise ValueError(f"Unknown tool: {func_name}")
-
-                            print(f"DEBUG: Found tool: {tool.name}")
-                            print(f"DEBUG: Tool schema: {tool.inputSchema}")
-
-                            # Prepare arguments according to the tool's input schema
-                            arguments = {}
-                            schema_properties = tool.inputSchema.get('properties', {})
-                            print(f"DEBUG: Schema properties: {schema_properties}")
-
-                            for param_name, param_info in schema_properties.items():
-                                if not params:  # Check if we have enough parameters
-                                    # For optional parameters, we can skip
-                                    if param_info.get('required', False):
-                                        raise ValueError(f"Missing required parameter {param_name} for {func_name}")
-                                    continue
-                                    
-                                value = params.pop(0)  # Get and remove the first parameter
-                                param_type = param_info.get('type', 'string')
-                                
-                                print(f"DEBUG: Converting parameter {param_name} with value {value} to type {param_type}")
-                                
-                                # Convert the value to the correct type based on the schema
-                                if param_type == 'integer':
-                                    # Handle empty string case for integers
-                                    if value.strip() == '':
-                                        # Use default value if available, otherwise use 0
-                                        default_value = param_info.get('default', 0)
-                                        print(f"DEBUG: Using default value {default_value} for empty parameter {param_name}")
-                                        arguments[param_name] = default_value
-                                    else:
-                                        arguments[param_name] = int(value)
-                                elif param_type == 'number':
-                                    # Handle empty string case for numbers
-                                    if value.strip() == '':
-                                        default_value = param_info.get('default', 0.0)
-                                        print(f"DEBUG: Using default value {default_value} for empty parameter {param_name}")
-                                        arguments[param_name] = default_value
-                                    else:
-                                        arguments[param_name] = float(value)
-                                elif param_type == 'array':
-                                    # Handle array input
-                                    if value.strip() == '':
-                                        # Use empty array for empty string
-                                        arguments[param_name] = []
-                                    else:
-                                        if isinstance(value, str):
-                                            value = value.strip('[]').split(',')
-                                        arguments[param_name] = [int(x.strip()) for x in value]
-                                else:
-                                    arguments[param_name] = str(value)
-
-                            print(f"DEBUG: Final arguments: {arguments}")
-                            print(f"DEBUG: Calling tool {func_name}")
-                            
-                            # Special case for show_unread_emails with no parameters
-                            if func_name == "show_unread_emails" and (not params or (len(params) == 1 and params[0].strip() == '')):
-                                print("DEBUG: Using default parameters for show_unread_emails")
-                                # Use default max_emails value
-                                arguments = {}  # Empty arguments will use the default value (5)
-
-                            result = await session.call_tool(func_name, arguments=arguments)
-                            print(f"DEBUG: Raw result: {result}")
-                            
-                            # Get the full result content
-                            if hasattr(result, 'content'):
-                                print(f"DEBUG: Result has content attribute")
-                                # Handle multiple content items
-                                if isinstance(result.content, list):
-                                    iteration_result = [
-                                        item.text if hasattr(item, 'text') else str(item)
-                                        for item in result.content
-                                    ]
-                                else:
-                                    iteration_result = str(result.content)
-                            else:
-                                print(f"DEBUG: Result has no content attribute")
-                                iteration_result = str(result)
-                                
-                            print(f"DEBUG: Final iteration result: {iteration_result}")
-                            
-                            # Format the response based on result type
-                            if isinstance(iteration_result, list):
-                                result_str = f"[{', '.join(iteration_result)}]"
+                # Whitespace is only stripped where it matters, in the conversion below
+                params = raw_params.split("|") if raw_params is not None else []
+
+                logger.debug("Raw function call: %s", response_text)
+                logger.debug("Function name: %s", func_name)
+                logger.debug("Raw parameters: %s", params)
+                
+                try:
+                    # Find the matching tool to get its input schema
+                    tool = tools_by_name.get(func_name)
+                    if not tool:
+                        logger.debug("Available tools: %s", list(tools_by_name))
+                        raise ValueError(f"Unknown tool: {func_name}")
+
+                    logger.debug("Found tool: %s", tool.name)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Tool schema: %s", tool.inputSchema)
+
+                    # Special case for show_unread_emails with no parameters: skip the
+                    # schema walk, empty arguments use the default value (5)
+                    if func_name == "show_unread_emails" and not "".join(params).strip():
+                        logger.debug("Using default parameters for show_unread_emails")
+                        arguments = {}
+                    else:
+                        # Prepare arguments according to the tool's input schema
+                        arguments = {}
+                        for param_name, param_type, required, default in tool_schemas[func_name]:
+                            if not params:  # Check if we have enough parameters
+                                # For optional parameters, we can skip
+                                if required:
+                                    raise ValueError(f"Missing required parameter {param_name} for {func_name}")
+                                continue
+
+                            value = params.pop(0)  # Get and remove the first parameter
+                            logger.debug("Converting parameter %s with value %s to type %s", param_name, value, param_type)
+
+                            # Convert the value to the correct type based on the schema;
+                            # empty non-string values fall back to the schema default
+                            conv = _CONVERT.get(param_type)
+                            if conv is None:
+                                arguments[param_name] = value.strip()
+                            elif value.strip():
+                                arguments[param_name] = conv(value)
                             else:
-                                result_str = str(iteration_result)
-                            
-                            iteration_response.append(
-                                f"Step {iteration+1} completed: {func_name} was called successfully with {arguments}. Result: {result_str}"
-                            )
-                            last_response = iteration_result
-
-                            # If we've shown the unread emails, we can finish
-                            if func_name == "show_unread_emails":
-                                print("\n=== Unread Emails Retrieved ===")
-                                print("You can now see your unread emails above.")
-                                # We could break here to stop after showing emails
-                                # break
-
-                        except Exception as e:
-                            print(f"DEBUG: Error details: {str(e)}")
-                            print(f"DEBUG: Error type: {type(e)}")
-                            import traceback
-                            traceback.print_exc()
-                            iteration_response.append(f"Error in iteration {iteration + 1}: {str(e)}")
-                            break
-
-                    elif response_text.startswith("FINAL_ANSWER:"):
-                        print("\n=== Gmail Operations Complete ===")
-                        print(f"Final answer: {response_text[13:]}")  # Extract the message part
-                        break
+                                logger.debug("Using default value %s for empty parameter %s", default, param_name)
+                                arguments[param_name] = default
+
+                    logger.debug("Final arguments: %s", arguments)
+                    logger.debug("Calling tool %s", func_name)
+
+                    tool_call = asyncio.create_task(session.call_tool(func_name, arguments=arguments))
+                    # While the tool runs, ask for the next step assuming it succeeds; only
+                    # for tools whose output the next step does not depend on
+                    if func_name in SPECULATIVE_TOOLS and state.iteration + 1 < max_iterations:
+                        speculative = await _submit_prompt(
+                            llm_queue,
+                            f"{prompt_prefix}\n\nProgress so far:\n{state.history.getvalue()}"
+                            f"Step {state.iteration+1} completed: {func_name} was called successfully with {arguments}.\n\n"
+                            "Continue with the next step based on the results above."
+                        )
+                    result = await tool_call
+                    # The speculated step assumed success; anything else is re-asked
+                    # with the real result
+                    if speculative is not None and not _reported_success(result):
+                        speculative.cancel()
+                        speculative = None
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Raw result: %s", result)
+
+                    result_str = _extract_result(result)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Final iteration result: %s", result_str)
+
+                    state.history.write(
+                        f"Step {state.iteration+1} completed: {func_name} was called successfully with {arguments}. Result: {result_str}\n"
+                    )
+                    # Keep the raw content; it is only stringified for the prompt
+                    state.last_response = getattr(result, 'content', result)
+
+                    # If we've shown the unread emails, we can finish
+                    if func_name == "show_unread_emails":
+                        print("\n=== Unread Emails Retrieved ===")
+                        print("You can now see your unread emails above.")
+                        # We could break here to stop after showing emails
+                        # break
+
+                except Exception as e:
+                    logger.debug("Error details: %s", e)
+                    logger.debug("Error type: %s", type(e))
+                    traceback.print_exc()
+                    state.history.write(f"Error in iteration {state.iteration + 1}: {str(e)}\n")
+                    if speculative is not None:
+                        speculative.cancel()
+                    break
 
-                    iteration += 1
+            elif response_text.startswith("FINAL_ANSWER:"):
+                print("\n=== Gmail Operations Complete ===")
+                print(f"Final answer: {response_text[13:]}")  # Extract the message part
+                break
+
+            state.iteration += 1
 
     except Exception as e:
         print(f"Error in main execution: {e}")
-        import traceback
         traceback.print_exc()
     finally:
-        reset_state()  # Reset at the end of main
+        if llm_worker is not None:
+            llm_worker.cancel()
 
 async def check_unread_emails():
     """Simple function to check unread emails"""
@@ -361,29 +534,35 @@ async def check_unread_emails():
         
     print("Checking unread emails...")
     try:
-        server_params = StdioServerParameters(
-            command="python",
-            args=["mcp_paint_server.py"]
-        )
+        session = await get_session()
+        result = await session.call_tool("show_unread_emails", arguments={})
 
-        async with stdio_client(server_params) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                result = await session.call_tool("show_unread_emails", arguments={})
-                
-                if hasattr(result, 'content') and result.content:
-                    for item in result.content:
-                        if hasattr(item, 'text'):
-                            print(item.text)
-                        else:
-                            print(item)
+        if hasattr(result, 'content') and result.content:
+            for item in result.content:
+                if hasattr(item, 'text'):
+                    print(item.text)
                 else:
-                    print("No unread emails found or error occurred")
+                    print(item)
+        else:
+            print("No unread emails found or error occurred")
     except Exception as e:
         print(f"Error checking emails: {e}")
 
+async def run(*entries):
+    """Run entry points on the shared MCP session, then shut the session down"""
+    try:
+        if len(entries) == 1:
+            await entries[0]()
+        else:
+            # Open the session in this task: the stdio transport has to be
+            # closed by the same task that opened it
+            await get_session()
+            await asyncio.gather(*(entry() for entry in entries))
+    finally:
+        await close_session()
+
 if __name__ == "__main__":
     # Choose which function to run
-    # asyncio.run(check_unread_emails())  # Simple check for unread emails
-    asyncio.run(main())  # Full conversation-based Gmail assistant
+    # asyncio.run(run(check_unread_emails))  # Simple check for unread emails
+    asyncio.run(run(main))  # Full conversation-based Gmail assistant
     
\ No newline at end of file
@@ -1,17 +1,23 @@
 import streamlit as st
-from recipe_agent import (
-    chef_agent, 
-    recipe_creator, 
-    health_adapter, 
-    nutrition_analyzer,
-    inventory_analyzer,
-    dish_preparer,
-    HealthGoal, 
-    Ingredient,
-    Recipe
-)
+import copy
+import hashlib
 import json
+import threading
 import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+# orjson serializes queries and raw tool outputs faster; fall back to the stdlib
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# recipe_agent builds the OpenAI client and all tools, so it is imported where
+# it is first needed; the first page render does not wait for it
+if TYPE_CHECKING:
+    import recipe_agent
 
 # This must be the first Streamlit command
 st.set_page_config(
@@ -23,6 +29,18 @@ st.set_page_config(
 st.title("🍳 ChefGPT - Your AI Cooking Assistant")
 st.subheader("Create recipes, adapt them for health goals, and plan meals based on what's in your kitchen")
 
+# Card title styling, sent once per full run instead of from inside the recipe
+# card (a fragment) on every redraw
+st.markdown("""
+<style>
+.recipe-title {
+    color: #4b6584;
+    text-align: center;
+    margin-bottom: 20px;
+}
+</style>
+""", unsafe_allow_html=True)
+
 # Initialize session state for storing results
 if 'recipe_result' not in st.session_state:
     st.session_state.recipe_result = None
@@ -38,28 +56,617 @@ if 'tool_outputs' not in st.session_state:
     st.session_state.tool_outputs = []
 if 'preparation_guide' not in st.session_state:
     st.session_state.preparation_guide = None
+if 'agent_cache' not in st.session_state:
+    st.session_state.agent_cache = {}
 
-# Sidebar for inventory input
-with st.sidebar:
+# Agent tools offered when no health goal or restriction is set
+NO_HEALTH_GOAL_TOOLS = ("inventory_analyzer", "recipe_creator", "nutrition_analyzer", "dish_preparer")
+
+# Keys that make a tool output a complete recipe rather than notes
+RECIPE_FIELDS = frozenset({"name", "ingredients", "instructions"})
+
+# Headings that route a preparation-guide section to its tab
+PREP_KEYS = frozenset({"Preparation", "Steps", "Instructions"})
+TIPS_KEYS = frozenset({"Tips", "Techniques"})
+PRES_KEYS = frozenset({"Presentation", "Plating", "Serving"})
+GUIDE_SECTIONS = (("prep", PREP_KEYS), ("tips", TIPS_KEYS), ("present", PRES_KEYS))
+
+# Placeholder instructions when the recipe text only exists in the tool output
+_SEE_TOOL_OUTPUT = ("See the detailed recipe in the tool output above",)
+
+# Cache agent plans so identical ingredient/goal combinations skip the LLM round-trip
+@st.cache_data(ttl=3600, max_entries=256)
+def _cached_chef_agent(query: str) -> dict:
+    from recipe_agent import chef_agent
+    return chef_agent(query)
+
+# The tools are cached the same way; lists are passed as tuples so they hash
+@st.cache_data(ttl=3600, max_entries=128, show_spinner=False)
+def _cached_recipe(ingredients: tuple, preferences: str) -> "recipe_agent.Recipe":
+    from recipe_agent import recipe_creator
+    return recipe_creator(list(ingredients), {"description": preferences} if preferences else None)
+
+@st.cache_data(ttl=3600, max_entries=128, show_spinner=False)
+def _cached_dish_guide(recipe_json: str, health_goal: str, restrictions: tuple) -> dict:
+    from recipe_agent import Recipe, dish_preparer
+    return dish_preparer(Recipe.model_validate_json(recipe_json), health_goal, list(restrictions) or None)
+
+@st.cache_data(ttl=3600, max_entries=128, show_spinner=False)
+def _cached_inventory_analysis(ingredients: tuple) -> dict:
+    from recipe_agent import inventory_analyzer
+    return inventory_analyzer(list(ingredients))
+
+@st.cache_data(ttl=3600, max_entries=128, show_spinner=False)
+def _cached_meal_plan(ingredients: tuple, days: int, meals_per_day: int, goal_type: str, restrictions: tuple):
+    from recipe_agent import HealthGoal, meal_planner
+    health_goal = None
+    if goal_type:
+        health_goal = HealthGoal(goal_type=goal_type, restrictions=list(restrictions) or None)
+    return meal_planner(list(ingredients), days, meals_per_day, health_goal)
+
+# Long LLM tool calls run here so the page keeps updating while they work
+@st.cache_resource
+def _tool_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="chefgpt-tool")
+
+# Keyed on the output's content, so a replayed agent response (session or
+# semantic cache hit) reuses the parsed Recipe; each call gets its own copy
+@st.cache_data(max_entries=256)
+def _parse_recipe_dict(recipe_data: dict, fallback_ingredients: tuple) -> "recipe_agent.Recipe":
+    """Build a Recipe from a tool's dict output, nested 'recipe' object or not"""
+    from recipe_agent import Recipe
+    # The Recipe validator unwraps a nested 'recipe' object, splits string
+    # ingredients/instructions and fills gaps from the inventory
+    return Recipe.model_validate(recipe_data, context={"fallback_ingredients": fallback_ingredients})
+
+def _store_adapted_recipe(adapted_recipe: "recipe_agent.Recipe"):
+    """Make a health-adapted recipe the current one"""
+    st.success("Successfully parsed adapted recipe data")
+    adapted_recipe.instructions.append(f"Health Adaptation: Recipe adapted to '{adapted_recipe.name}'")
+    st.session_state.health_adapted_recipe = adapted_recipe
+    st.session_state.recipe_result = adapted_recipe
+
+def _note_failed_adaptation(output, error: Exception):
+    """Warn about unusable health_adapter output and mark the current recipe"""
+    st.warning(f"Could not parse adapted recipe: {str(error)}")
+    if not isinstance(output, dict):
+        # Dict output is already shown above the parse attempt
+        st.markdown("**Raw Health Adapter Output:**")
+        st.markdown(f"```\n{output}\n```")
+    recipe = st.session_state.recipe_result
+    if recipe:
+        recipe.name = f"{recipe.name} (Health Adapted - parsing failed)"
+
+def _fallback_parse_adapted(output, fallback_ingredients: tuple):
+    """Handle health_adapter output that is not a complete recipe: fill a partial
+    one from the inventory, or note the adaptation on the current recipe"""
+    from pydantic import ValidationError
+    recipe = st.session_state.recipe_result
+    if isinstance(output, str):
+        if recipe:
+            recipe.name = f"{recipe.name} (Health Adapted)"
+        return
+    if not isinstance(output, dict):
+        _note_failed_adaptation(output, TypeError(f"unexpected {type(output).__name__} output"))
+        return
+
+    # Find the recipe: a nested 'recipe' object, the output itself,
+    # or a complete recipe under 'result'
+    nested, result = output.get('recipe'), output.get('result')
+    if isinstance(nested, dict):
+        recipe_data = nested
+    elif RECIPE_FIELDS <= output.keys():
+        recipe_data = output
+    elif isinstance(result, dict) and RECIPE_FIELDS <= result.keys():
+        recipe_data = result
+    else:
+        recipe_data = None
+
+    if recipe_data is not None:
+        try:
+            adapted_recipe = _parse_recipe_dict(recipe_data, fallback_ingredients)
+        except ValidationError as e:
+            _note_failed_adaptation(output, e)
+        else:
+            _store_adapted_recipe(adapted_recipe)
+    elif 'result' in output and recipe:
+        # Keep the existing recipe but add the adaptation notes
+        recipe.name = f"{recipe.name} (Health Adapted)"
+        if isinstance(result, str):
+            recipe.instructions.append(f"Health Adaptation: {result}")
+
+def _find_title(text: str, keyword: str = None):
+    """Return the first short, non-empty line among the first three, or None"""
+    for line in text.splitlines()[:3]:
+        line = line.strip()
+        if 0 < len(line) < 50 and (keyword is None or keyword in line.lower()):
+            return line
+    return None
+
+def _json_text(obj, pretty: bool = False, sort_keys: bool = False) -> str:
+    """Serialize obj to a JSON string, with orjson when it is installed"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=str, option=option).decode()
+    return json.dumps(obj, indent=2 if pretty else None, sort_keys=sort_keys, default=str)
+
+def _normalize_ingredients(items) -> tuple:
+    """Split ingredient dicts, models or plain strings into parallel
+    (quantities, units, names) lists so the render loops need no type checks"""
+    quantities, units, names = [], [], []
+    for ing in items:
+        if isinstance(ing, dict):
+            quantities.append(ing.get('quantity') or '')
+            units.append(ing.get('unit') or '')
+            names.append(ing.get('name') or '')
+        else:
+            quantities.append(getattr(ing, 'quantity', '') or '')
+            units.append(getattr(ing, 'unit', '') or '')
+            names.append(getattr(ing, 'name', str(ing)))
+    return quantities, units, names
+
+def _md_cell(value) -> str:
+    """Make a value safe to place in a markdown table cell"""
+    return " ".join(str(value).split()).replace("|", "\\|")
+
+# Split the inventory only when its text changes, not on every rerun. Every edit
+# is a new key, so keep only recent texts and skip the spinner for this cheap call
+@st.cache_data(max_entries=64, show_spinner=False)
+def parse_inventory(text: str) -> tuple:
+    return tuple(s for s in (line.strip() for line in text.splitlines()) if s)
+
+# Near-duplicate queries (reworded preferences, etc.) reuse a previous agent plan
+@st.cache_resource
+def _semantic_cache() -> "recipe_agent.SemanticCache":
+    from recipe_agent import SemanticCache
+    return SemanticCache()
+
+def recipe_query(ingredients, preferences, goal_type, restrictions):
+    """Build the recipe tab's agent query, normalized so equivalent requests share
+    a cache entry, along with the (scope, preferences) semantic cache key, which
+    is None without preferences since the exact cache already covers those"""
+    query = {
+        "task": "create_recipe",
+        "ingredients": sorted(ingredients),
+        "preferences": preferences if preferences else None,
+        "health_goals": None
+    }
+    if goal_type != "None" or restrictions:
+        query["health_goals"] = {
+            "goal_type": goal_type.lower() if goal_type != "None" else None,
+            "restrictions": sorted(restrictions) if restrictions else None
+        }
+    else:
+        # Without health goals the agent has no reason to call health_adapter
+        query["available_tools"] = list(NO_HEALTH_GOAL_TOOLS)
+    query_json = _json_text(query, sort_keys=True)
+    preferences = (preferences or "").strip()
+    if not preferences:
+        return query_json, None
+    # Only the free-text preferences are compared by similarity; everything
+    # structured must match exactly
+    scope = _json_text({k: v for k, v in query.items() if k != "preferences"}, sort_keys=True)
+    return query_json, (scope, preferences)
+
+def _query_cache_key(query_json: str) -> str:
+    return hashlib.blake2b(query_json.encode(), digest_size=8).hexdigest()
+
+# Agent responses fetched in the background, shared by all sessions. Worker
+# threads have no Streamlit context, so they cannot use st.session_state.
+@st.cache_resource
+def _prefetch_store() -> dict:
+    return {"lock": threading.Lock(), "responses": {}, "pending": set()}
+
+PREFETCH_MAX_RESPONSES = 64
+PREFETCH_MIN_INTERVAL = 1.0  # seconds between speculative agent calls per session
+
+def prefetch_recipe_agent():
+    """on_change callback: warm the agent response for the recipe tab while the
+    user is still editing, so Create Recipe usually finds it ready"""
+    now = time.monotonic()
+    if now - st.session_state.get("last_prefetch", 0.0) < PREFETCH_MIN_INTERVAL:
+        return
+    ingredients = parse_inventory(st.session_state.get("inventory_text", ""))
+    if not ingredients:
+        return
+    st.session_state.last_prefetch = now
+    query_json, _ = recipe_query(
+        ingredients,
+        st.session_state.get("recipe_preferences", ""),
+        st.session_state.get("goal_type", "None"),
+        st.session_state.get("restrictions", [])
+    )
+    cache_key = _query_cache_key(query_json)
+    store = _prefetch_store()
+    with store["lock"]:
+        if cache_key in store["responses"] or cache_key in store["pending"]:
+            return
+        store["pending"].add(cache_key)
+
+    def fetch():
+        from recipe_agent import chef_agent
+        try:
+            response = chef_agent(query_json)
+        except Exception:
+            response = None
+        with store["lock"]:
+            store["pending"].discard(cache_key)
+            # Error responses have no tool steps; let the click retry those
+            if response and response.get("tool_sequence"):
+                if len(store["responses"]) >= PREFETCH_MAX_RESPONSES:
+                    store["responses"].pop(next(iter(store["responses"])))
+                store["responses"][cache_key] = response
+
+    threading.Thread(target=fetch, daemon=True).start()
+
+def agent_events(query_json: str, semantic_key):
+    """Yield the agent's reasoning and tool steps, streaming them live on a cache miss"""
+    # Reuse this session's response for an unchanged query, then near-duplicates
+    cache_key = _query_cache_key(query_json)
+    cached = st.session_state.agent_cache.get(cache_key)
+    if cached is None:
+        # A background prefetch may already have answered this exact query
+        store = _prefetch_store()
+        with store["lock"]:
+            cached = store["responses"].get(cache_key)
+        if cached is not None:
+            st.session_state.agent_cache[cache_key] = cached
+    vector = None
+    if cached is None and semantic_key is not None:
+        # One embeddings round-trip; on a miss it is the cost of caching the answer
+        scope, preferences = semantic_key
+        cache = _semantic_cache()
+        try:
+            vector = cache.embed(preferences)
+            cached = cache.lookup(scope, vector)
+        except Exception:
+            # Embedding failures only cost the cache, never the request
+            vector = None
+        if cached is not None:
+            st.session_state.agent_cache[cache_key] = cached
+
+    if cached is not None:
+        # The rendering edits the steps, so hand out a copy
+        response = copy.deepcopy(cached)
+        yield {"type": "reasoning", "reasoning": response.get("reasoning", "No reasoning provided")}
+        for index, step in enumerate(response.get("tool_sequence", [])):
+            yield {"type": "step", "index": index, "step": step}
+        return
+
+    # Each step is rendered as soon as the model has generated it
+    from recipe_agent import chef_agent_stream
+    for event in chef_agent_stream(query_json):
+        if event["type"] == "final":
+            response = event["response"]
+            st.session_state.agent_cache[cache_key] = response
+            if vector is not None and response.get("tool_sequence"):
+                _semantic_cache().store(semantic_key[0], vector, response)
+        else:
+            yield event
+
+# Sidebar for inventory input. Editing it only reruns this fragment; the tabs
+# pick up the new values from session state on their next run.
+@st.fragment
+def inventory_sidebar():
     st.header("Your Kitchen Inventory")
-    inventory_text = st.text_area(
+    st.text_area(
         "List your ingredients (one per line):",
         height=200,
-        placeholder="chicken\nrice\nonions\ngarlic\nbell peppers\ntomatoes\nolive oil\nsalt\npepper"
+        placeholder="chicken\nrice\nonions\ngarlic\nbell peppers\ntomatoes\nolive oil\nsalt\npepper",
+        key="inventory_text",
+        on_change=prefetch_recipe_agent
     )
     
     st.header("Health Goals (Optional)")
-    goal_type = st.selectbox(
+    st.selectbox(
         "Health Goal:",
-        ["None", "Weight Loss", "Muscle Gain", "Heart Health", "Diabetes Management", "General Health"]
+        ["None", "Weight Loss", "Muscle Gain", "Heart Health", "Diabetes Management", "General Health"],
+        key="goal_type"
     )
     
-    restrictions = st.multiselect(
+    st.multiselect(
         "Dietary Restrictions:",
-        ["Vegetarian", "Vegan", "Gluten-Free", "Dairy-Free", "Nut-Free", "Low-Carb", "Low-Fat", "Low-Sodium"]
+        ["Vegetarian", "Vegan", "Gluten-Free", "Dairy-Free", "Nut-Free", "Low-Carb", "Low-Fat", "Low-Sodium"],
+        key="restrictions"
     )
+
+with st.sidebar:
+    inventory_sidebar()
+
+inventory_text = st.session_state.inventory_text
+goal_type = st.session_state.goal_type
+restrictions = st.session_state.restrictions
+use_health_goals = goal_type != "None" or restrictions
+
+inventory_items = parse_inventory(inventory_text)
+
+# Result views. Each is a fragment, so its buttons rerun only that view instead
+# of the whole page; the tab handlers call them after storing new results.
+def _clear_state(key: str):
+    st.session_state[key] = None
+
+@st.fragment
+def recipe_card():
+    if st.session_state.recipe_result:
+        st.markdown("---")
+        
+        # Create a nice card-like container for the recipe
+        recipe_container = st.container(border=True)
+        with recipe_container:
+            st.markdown("<div class='recipe-title'>📝 Your Final Recipe</div>", unsafe_allow_html=True)
+            
+            st.subheader(st.session_state.recipe_result.name)
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.write("**Preparation Time:**", f"{st.session_state.recipe_result.prep_time} minutes" if st.session_state.recipe_result.prep_time else "Not specified")
+            with col2:
+                st.write("**Cooking Time:**", f"{st.session_state.recipe_result.cook_time} minutes" if st.session_state.recipe_result.cook_time else "Not specified")
+            with col3:
+                st.write("**Servings:**", st.session_state.recipe_result.servings or "Not specified")
+            
+            st.subheader("Ingredients")
+            # One markdown element per list instead of one per line
+            quantities, units, names = _normalize_ingredients(st.session_state.recipe_result.ingredients)
+            st.markdown("\n".join(f"- {quantity} {unit} {name}" for quantity, unit, name in zip(quantities, units, names)))
+            
+            st.subheader("Instructions")
+            st.markdown("\n".join(f"{i+1}. {step}" for i, step in enumerate(st.session_state.recipe_result.instructions)))
+            
+            # Add a section to display the raw recipe data for debugging
+            with st.expander("Debug: Raw Recipe Data"):
+                # pydantic-core serializes the model directly to a string, which is
+                # cheaper than building and rendering an st.json tree
+                st.code(st.session_state.recipe_result.model_dump_json(indent=2), language="json")
+            
+            if st.session_state.recipe_result.nutrition:
+                st.subheader("Nutrition Information")
+                
+                # Display key nutrition facts in a more readable format
+                if isinstance(st.session_state.recipe_result.nutrition, dict):
+                    col1, col2 = st.columns(2)
+                    
+                    with col1:
+                        st.write("**Calories:**", st.session_state.recipe_result.nutrition.get("calories", "Not available"))
+                        st.write("**Protein:**", st.session_state.recipe_result.nutrition.get("protein", "Not available"))
+                        st.write("**Carbs:**", st.session_state.recipe_result.nutrition.get("carbs", "Not available"))
+                    
+                    with col2:
+                        st.write("**Fat:**", st.session_state.recipe_result.nutrition.get("fat", "Not available"))
+                        st.write("**Fiber:**", st.session_state.recipe_result.nutrition.get("fiber", "Not available"))
+                        st.write("**Sugar:**", st.session_state.recipe_result.nutrition.get("sugar", "Not available"))
+                    
+                    # Show full nutrition details in an expander
+                    # A JSON code block ships one string instead of a client-side JSON tree
+                    with st.expander("View Full Nutrition Details"):
+                        st.code(_json_text(st.session_state.recipe_result.nutrition, pretty=True), language="json")
+                else:
+                    st.write(st.session_state.recipe_result.nutrition)
+            
+            # Add a button to prepare the dish
+            if st.button("Prepare This Dish"):
+                with st.spinner("Creating detailed preparation guide..."):
+                    try:
+                        # Get health goals if specified
+                        health_goal = None
+                        if st.session_state.goal_type != "None":
+                            health_goal = st.session_state.goal_type
+                        
+                        # Call the dish preparer tool
+                        preparation_result = _cached_dish_guide(
+                            st.session_state.recipe_result.model_dump_json(),
+                            health_goal,
+                            tuple(st.session_state.restrictions)
+                        )
+                        
+                        # Store the result
+                        st.session_state.preparation_guide = preparation_result
+                        st.success("Preparation guide created!")
+                    except Exception as e:
+                        st.error(f"Error creating preparation guide: {str(e)}")
+            
+            # Display preparation guide if available
+            if st.session_state.preparation_guide:
+                # The preparation guide gets its own card inside the recipe card
+                with st.container(border=True):
+                    # Display the technique name prominently
+                    prep_guide = st.session_state.preparation_guide
+                    technique_name = prep_guide.get('technique_name', "Chef's Preparation Guide")
+                
+                    st.markdown(f"<div class='recipe-title'>👨‍🍳 {technique_name}</div>", unsafe_allow_html=True)
+                
+                    # Display recipe name
+                    st.markdown(f"### For: {prep_guide['recipe_name']}")
+                
+                    # Display health considerations if any
+                    if prep_guide['health_considerations']:
+                        st.markdown(f"**Health Focus:** {prep_guide['health_considerations']}")
+                
+                    # Display dietary restrictions if any
+                    if prep_guide['dietary_restrictions']:
+                        st.markdown(f"**Dietary Restrictions:** {', '.join(prep_guide['dietary_restrictions'])}")
+                
+                    # Create tabs for different sections of the preparation guide
+                    prep_tabs = st.tabs(["Full Guide", "Preparation Steps", "Cooking Tips", "Presentation"])
+                
+                    with prep_tabs[0]:
+                        # Display the full preparation guide with markdown formatting
+                        st.markdown(prep_guide['preparation_guide'])
+                
+                    # Split the guide once and file each section under every tab whose
+                    # keywords it mentions (first match wins per tab)
+                    buckets = {"prep": None, "tips": None, "present": None}
+                    for section in prep_guide['preparation_guide'].split("##"):
+                        for bucket, keywords in GUIDE_SECTIONS:
+                            if buckets[bucket] is None and any(k in section for k in keywords):
+                                buckets[bucket] = section
+                    
+                    for prep_tab, bucket, topic in (
+                        (prep_tabs[1], "prep", "preparation steps"),
+                        (prep_tabs[2], "tips", "cooking tips"),
+                        (prep_tabs[3], "present", "presentation suggestions")
+                    ):
+                        with prep_tab:
+                            if buckets[bucket] is not None:
+                                st.markdown(f"## {buckets[bucket]}")
+                            else:
+                                st.markdown(f"See the Full Guide tab for {topic}.")
+                
+                    # Button to clear the preparation guide
+                    st.button("Clear Preparation Guide", on_click=_clear_state, args=("preparation_guide",))
+
+@st.fragment
+def meal_plan_view():
+    if st.session_state.meal_plan_result:
+        st.markdown("---")
+        st.header("📅 Your Meal Plan")
+        
+        if isinstance(st.session_state.meal_plan_result, str):
+            # If it's a string (from the fallback), just display it
+            st.markdown(st.session_state.meal_plan_result)
+        else:
+            # If it's a MealPlan object, format it nicely
+            meal_plan = st.session_state.meal_plan_result
+            
+            st.write(f"**{meal_plan.days}-Day Meal Plan with {meal_plan.meals_per_day} meals per day**")
+            
+            # Index the meals by day once; a meal belongs to its 1-based "day" and
+            # to its 0-based "day_index" day
+            meals_by_day = defaultdict(list)
+            for meal in meal_plan.recipes:
+                day = meal.get("day", 0)
+                meals_by_day[day].append(meal)
+                if meal.get("day_index", 0) + 1 != day:
+                    meals_by_day[meal.get("day_index", 0) + 1].append(meal)
+            
+            # Display each day's meals
+            for day_idx in range(meal_plan.days):
+                st.subheader(f"Day {day_idx + 1}")
+                
+                # Get meals for this day
+                day_meals = meals_by_day.get(day_idx + 1)
+                
+                if not day_meals:
+                    # If day information is not available, divide recipes evenly
+                    start_idx = day_idx * meal_plan.meals_per_day
+                    end_idx = start_idx + meal_plan.meals_per_day
+                    day_meals = meal_plan.recipes[start_idx:end_idx]
+                
+                # Display each meal
+                for meal_idx, meal in enumerate(day_meals[:meal_plan.meals_per_day]):
+                    meal_name = meal.get("name", f"Meal {meal_idx + 1}")
+                    meal_type = meal.get("meal_type", ["Breakfast", "Lunch", "Dinner"][meal_idx % 3])
+                    
+                    # Expanders take no key; Streamlit matches them across reruns by
+                    # position and label, so both must come from the stored plan only
+                    with st.expander(f"{meal_type}: {meal_name}", expanded=True):
+                        st.write("**Description:**", meal.get("description", "No description available"))
+                        
+                        ingredients = meal.get("ingredients", meal.get("main_ingredients", []))
+                        if isinstance(ingredients, list):
+                            quantities, units, names = _normalize_ingredients(ingredients)
+                            st.markdown("**Main Ingredients:**\n" + "\n".join(
+                                f"- {quantity} {unit} {name}" for quantity, unit, name in zip(quantities, units, names)
+                            ))
+                        else:
+                            st.write("**Main Ingredients:**")
+                            st.write(ingredients)
+                        
+                        if "nutrition" in meal:
+                            st.write("**Nutrition:**", meal["nutrition"])
+            
+            # Display nutrition summary if available
+            if meal_plan.nutrition_summary:
+                st.subheader("Nutrition Summary")
+                st.code(_json_text(meal_plan.nutrition_summary, pretty=True), language="json")
+        
+        # Button to clear the meal plan
+        st.button("Clear Meal Plan", on_click=_clear_state, args=("meal_plan_result",))
+
+def _finish_meal_plan(job: dict) -> list:
+    """Store the results of a finished meal-plan job; returns (level, message) notices"""
+    # The job's tools already loaded recipe_agent, so this is a module-cache lookup
+    from recipe_agent import MealPlan
+    notices = []
+    ingredients, days, meals_per_day = job["ingredients"], job["days"], job["meals_per_day"]
+    try:
+        st.session_state.inventory_analysis = job["inventory"].result()
+        notices.append(("success", "✅ Inventory analyzed"))
+        
+        # Create the meal plan
+        try:
+            # Store the result and display success
+            st.session_state.meal_plan_result = job["plan"].result()
+            notices.append(("success", "✅ Meal plan created successfully!"))
+        except Exception as meal_plan_error:
+            notices.append(("warning", f"Error in meal planner: {str(meal_plan_error)}"))
+            notices.append(("info", "Created a simplified meal plan instead."))
+            
+            # Create a simplified meal plan as fallback
+            simplified_recipes = []
+            for day in range(1, days + 1):
+                for meal in range(1, meals_per_day + 1):
+                    meal_type = ["Breakfast", "Lunch", "Dinner"][meal % 3]
+                    simplified_recipes.append({
+                        "day": day,
+                        "meal_type": meal_type,
+                        "name": f"Simple {meal_type} with {', '.join(ingredients[:3])}",
+                        "description": "A simple meal using available ingredients",
+                        "main_ingredients": ingredients[:5],
+                        "nutrition": "Not available"
+                    })
+            
+            st.session_state.meal_plan_result = MealPlan(
+                days=days,
+                meals_per_day=meals_per_day,
+                recipes=simplified_recipes,
+                nutrition_summary={"note": "Simplified meal plan - detailed nutrition not available"}
+            )
+            notices.append(("success", "✅ Simplified meal plan created"))
     
-    use_health_goals = goal_type != "None" or restrictions
+    except Exception as e:
+        notices.append(("error", f"Error creating meal plan: {str(e)}"))
+        notices.append(("info", "Used the general chef agent instead."))
+        
+        # Fallback to the general agent
+        with st.spinner("Asking the general chef agent..."):
+            result = _cached_chef_agent(job["fallback_query"])
+        if isinstance(result, dict) and "final_result" in result:
+            st.session_state.meal_plan_result = result["final_result"]
+        else:
+            st.session_state.meal_plan_result = str(result)
+    return notices
+
+# Only mounted while a job is pending, so it does not poll an idle page
+@st.fragment(run_every=0.5)
+def meal_plan_progress():
+    job = st.session_state.get("meal_plan_job")
+    if job is None:
+        return
+    inventory_done, plan_done = job["inventory"].done(), job["plan"].done()
+    with st.status("Creating your meal plan...", expanded=True):
+        st.write("✅ Inventory analyzed" if inventory_done else "⏳ Analyzing inventory...")
+        st.write("✅ Meals planned" if plan_done else "⏳ Planning meals...")
+    if not (inventory_done and plan_done):
+        return
+    del st.session_state.meal_plan_job
+    st.session_state.meal_plan_notices = _finish_meal_plan(job)
+    # Redraw the whole page so the plan shows and this fragment unmounts
+    st.rerun(scope="app")
+
+@st.fragment
+def nutrition_view():
+    if st.session_state.nutrition_result:
+        st.markdown("---")
+        st.header("🔬 Nutrition Analysis")
+        st.markdown(st.session_state.nutrition_result)
+        
+        # Button to clear the nutrition analysis
+        st.button("Clear Nutrition Analysis", on_click=_clear_state, args=("nutrition_result",))
 
 # Main content area
 tab1, tab2, tab3 = st.tabs(["Recipe Creator", "Meal Planner", "Nutrition Analyzer"])
@@ -68,32 +675,29 @@ with tab1:
     st.header("Create a Recipe")
     recipe_preferences = st.text_area(
         "Any specific preferences for your recipe? (cuisine, cooking method, etc.)",
-        placeholder="I'd like a quick stir-fry with Asian flavors"
+        placeholder="I'd like a quick stir-fry with Asian flavors",
+        key="recipe_preferences",
+        on_change=prefetch_recipe_agent
     )
     
     # Add a checkbox to show tool outputs
     show_tool_process = st.checkbox("Show step-by-step tool process", value=True)
     
     if st.button("Create Recipe", key="create_recipe"):
-        if not inventory_text.strip():
+        if not inventory_items:
             st.error("Please add some ingredients to your inventory first!")
         else:
+            from pydantic import ValidationError
+            from recipe_agent import DEFAULT_INSTRUCTIONS, Recipe, ingredients_from_names, split_lines
+            
             # Clear previous tool outputs
             st.session_state.tool_outputs = []
             
             # Get ingredients list
-            ingredients = [ing.strip() for ing in inventory_text.splitlines() if ing.strip()]
+            ingredients = list(inventory_items)
             
             # Create the query for the agent with health goals and dietary restrictions
-            query = {
-                "task": "create_recipe",
-                "ingredients": ingredients,
-                "preferences": recipe_preferences if recipe_preferences else None,
-                "health_goals": {
-                    "goal_type": goal_type if goal_type != "None" else None,
-                    "restrictions": restrictions if restrictions else None
-                }
-            }
+            query_json, semantic_key = recipe_query(inventory_items, recipe_preferences, goal_type, restrictions)
             
             # Create a container for the tool process
             process_container = st.container()
@@ -105,38 +709,46 @@ with tab1:
                     try:
                         with st.spinner("Processing your request..."):
                             # Let the LLM decide tool execution order
-                            agent_response = chef_agent(json.dumps(query))
+                            events = agent_events(query_json, semantic_key)
                             
-                            # Check if agent_response is a dictionary with the expected structure
-                            if isinstance(agent_response, dict) and "reasoning" in agent_response:
+                            # The first event is always the agent's reasoning
+                            reasoning_event = next(events, None)
+                            if reasoning_event is not None:
                                 # Display the agent's reasoning
                                 with st.expander("💭 Agent's Reasoning", expanded=True):
-                                    st.markdown(agent_response.get("reasoning", "No reasoning provided"))
+                                    st.markdown(reasoning_event["reasoning"])
                                 
-                                # Execute and display each tool in the sequence
-                                for step_index, step in enumerate(agent_response.get("tool_sequence", [])):
+                                # Execute and display each tool in the sequence as it arrives
+                                for step_index, step in ((e["index"], e["step"]) for e in events):
                                     tool_name = step.get("tool_name", "Tool")
-                                    with st.expander(f"Step {step_index+1}: ✨ {tool_name}", expanded=True):
-                                        # Display reason with better formatting
-                                        st.markdown(f"### Why this tool?")
-                                        st.markdown(f"_{step.get('reason', 'No reason provided')}_")
-                                        
-                                        # Display input parameters in a clearer format
-                                        st.markdown("### Input Parameters")
+                                    if tool_name == "health_adapter" and not use_health_goals:
+                                        # Nothing to adapt to; don't parse or render the step
+                                        continue
+                                    with st.expander(f"Step {step_index+1}: ✨ {tool_name}", expanded=False):
+                                        # Display reason and input parameters in a single markdown element
                                         input_params = step.get("input", {})
+                                        step_md = [
+                                            "### Why this tool?",
+                                            f"_{step.get('reason', 'No reason provided')}_",
+                                            "### Input Parameters"
+                                        ]
                                         if isinstance(input_params, dict):
-                                            for param_name, param_value in input_params.items():
-                                                if isinstance(param_value, list):
-                                                    st.markdown(f"**{param_name}:**")
-                                                    for item in param_value:
-                                                        st.markdown(f"- {item}")
-                                                else:
-                                                    st.markdown(f"**{param_name}:** {param_value}")
+                                            # Scalar parameters go in one table, lists as tight bullet lists
+                                            rows = [
+                                                f"| {name} | {_md_cell(value)} |"
+                                                for name, value in input_params.items() if not isinstance(value, list)
+                                            ]
+                                            if rows:
+                                                step_md.append("| Parameter | Value |\n|---|---|\n" + "\n".join(rows))
+                                            step_md.extend(
+                                                f"**{name}:**\n" + "\n".join(f"- {item}" for item in value)
+                                                for name, value in input_params.items() if isinstance(value, list)
+                                            )
                                         else:
-                                            st.markdown(f"**Input:** {input_params}")
-                                        
+                                            step_md.append(f"**Input:** {input_params}")
                                         # Display the output with better formatting
-                                        st.markdown("### Output")
+                                        step_md.append("### Output")
+                                        st.markdown("\n\n".join(step_md))
                                         output = step.get("output", {})
                                         
                                         # Create columns for a cleaner layout
@@ -145,129 +757,35 @@ with tab1:
                                                 # If output is a string, try to create a minimal recipe
                                                 if isinstance(output, str):
                                                     # Create a minimal recipe from the text output
-                                                    recipe_name = "Quick Recipe"
-                                                    lines = output.split('\n')
-                                                    for line in lines[:3]:  # Check first few lines for a title
-                                                        if len(line.strip()) > 0 and len(line.strip()) < 50:
-                                                            recipe_name = line.strip()
-                                                            break
+                                                    recipe_name = _find_title(output) or "Quick Recipe"
                                                     
                                                     # Create a minimal recipe
                                                     minimal_recipe = Recipe(
                                                         name=recipe_name,
-                                                        ingredients=[Ingredient(name=ing) for ing in ingredients[:5]],
-                                                        instructions=["See full recipe details in the output above"]
+                                                        ingredients=ingredients_from_names(ingredients[:5]),
+                                                        instructions=_SEE_TOOL_OUTPUT
                                                     )
                                                     st.session_state.recipe_result = minimal_recipe
                                                 elif isinstance(output, dict):
-                                                    # Display the raw output for debugging
+                                                    # Display the raw output for debugging; a code block is much
+                                                    # cheaper to render than the interactive st.json tree
                                                     st.markdown("**Raw Recipe Creator Output:**")
-                                                    st.json(output)
+                                                    st.code(_json_text(output, pretty=True), language="json")
                                                     
-                                                    # Check if output has a nested 'recipe' object
-                                                    if 'recipe' in output and isinstance(output['recipe'], dict):
-                                                        recipe_data = output['recipe']
-                                                        # Try to parse the nested recipe object
-                                                        try:
-                                                            # Ensure ingredients are properly formatted
-                                                            if 'ingredients' in recipe_data and isinstance(recipe_data['ingredients'], list):
-                                                                for i, ingredient in enumerate(recipe_data['ingredients']):
-                                                                    if isinstance(ingredient, str):
-                                                                        # Convert string ingredients to proper format
-                                                                        parts = ingredient.split(' ', 1)
-                                                                        if len(parts) > 1:
-                                                                            quantity = parts[0]
-                                                                            name = parts[1]
-                                                                            recipe_data['ingredients'][i] = {"name": name, "quantity": quantity, "unit": ""}
-                                                                        else:
-                                                                            recipe_data['ingredients'][i] = {"name": ingredient, "quantity": "", "unit": ""}
-                                                            else:
-                                                                recipe_data['ingredients'] = [Ingredient(name=ing) for ing in ingredients]
-                                                            
-                                                            # Try to extract instructions
-                                                            recipe_instructions = []
-                                                            if 'instructions' in recipe_data:
-                                                                if isinstance(recipe_data['instructions'], list):
-                                                                    recipe_instructions = recipe_data['instructions']
-                                                                elif isinstance(recipe_data['instructions'], str):
-                                                                    recipe_instructions = [line.strip() for line in recipe_data['instructions'].split('\n') if line.strip()]
-                                                            
-                                                            # If no instructions were found, create a basic one
-                                                            if not recipe_instructions:
-                                                                recipe_instructions = ["Combine all ingredients", "Cook until done", "Serve and enjoy"]
-                                                            
-                                                            # Create a recipe with the extracted information
-                                                            st.session_state.recipe_result = Recipe(
-                                                                name=recipe_data.get('name', f"Recipe with {ingredients[0].capitalize()}"),
-                                                                ingredients=[Ingredient(**ing) for ing in recipe_data['ingredients']],
-                                                                instructions=recipe_instructions,
-                                                                prep_time=recipe_data.get('prep_time'),
-                                                                cook_time=recipe_data.get('cook_time'),
-                                                                servings=recipe_data.get('servings')
-                                                            )
-                                                            st.success("Successfully parsed nested recipe data")
-                                                        except Exception as nested_error:
-                                                            st.warning(f"Could not parse nested recipe: {str(nested_error)}")
-                                                            # Create a recipe with the available information
-                                                            recipe_name = recipe_data.get('name', f"Recipe with {ingredients[0].capitalize()}")
-                                                            
-                                                            # Try to extract ingredients
-                                                            recipe_ingredients = []
-                                                            if 'ingredients' in recipe_data:
-                                                                if isinstance(recipe_data['ingredients'], list):
-                                                                    for ing in recipe_data['ingredients']:
-                                                                        if isinstance(ing, dict) and 'name' in ing:
-                                                                            recipe_ingredients.append(Ingredient(**ing))
-                                                                        elif isinstance(ing, str):
-                                                                            recipe_ingredients.append(Ingredient(name=ing))
-                                                            elif isinstance(recipe_data['ingredients'], str):
-                                                                for line in recipe_data['ingredients'].split('\n'):
-                                                                    if line.strip():
-                                                                        recipe_ingredients.append(Ingredient(name=line.strip()))
-                                                            
-                                                            # If no ingredients were found, use the input ingredients
-                                                            if not recipe_ingredients:
-                                                                recipe_ingredients = [Ingredient(name=ing) for ing in ingredients]
-                                                            
-                                                            # Try to extract instructions
-                                                            recipe_instructions = []
-                                                            if 'instructions' in recipe_data:
-                                                                if isinstance(recipe_data['instructions'], list):
-                                                                    recipe_instructions = recipe_data['instructions']
-                                                                elif isinstance(recipe_data['instructions'], str):
-                                                                    recipe_instructions = [line.strip() for line in recipe_data['instructions'].split('\n') if line.strip()]
-                                                            
-                                                            # If no instructions were found, create a basic one
-                                                            if not recipe_instructions:
-                                                                recipe_instructions = ["Combine all ingredients", "Cook until done", "Serve and enjoy"]
-                                                            
-                                                            # Create a recipe with the extracted information
-                                                            st.session_state.recipe_result = Recipe(
-                                                                name=recipe_name,
-                                                                ingredients=recipe_ingredients,
-                                                                instructions=recipe_instructions,
-                                                                prep_time=recipe_data.get('prep_time'),
-                                                                cook_time=recipe_data.get('cook_time'),
-                                                                servings=recipe_data.get('servings')
-                                                            )
                                                     # Check if output has a 'result' key but not the required Recipe fields
-                                                    elif 'result' in output and not all(key in output for key in ['name', 'ingredients', 'instructions']):
+                                                    if not isinstance(output.get('recipe'), dict) and 'result' in output and not RECIPE_FIELDS <= output.keys():
                                                         # Create a recipe from the ingredients
-                                                        recipe_name = f"Recipe with {ingredients[0].capitalize()}"
-                                                        
                                                         # Try to extract a better name from the result if possible
-                                                        if isinstance(output['result'], str) and "recipe" in output['result'].lower():
-                                                            lines = output['result'].split('\n')
-                                                            for line in lines[:3]:
-                                                                if len(line.strip()) > 0 and len(line.strip()) < 50 and "recipe" in line.lower():
-                                                                    recipe_name = line.strip()
-                                                                    break
+                                                        recipe_name = None
+                                                        if isinstance(output['result'], str):
+                                                            recipe_name = _find_title(output['result'], keyword="recipe")
+                                                        recipe_name = recipe_name or f"Recipe with {ingredients[0].capitalize()}"
                                                         
                                                         # Create a minimal recipe
                                                         minimal_recipe = Recipe(
                                                             name=recipe_name,
-                                                            ingredients=[Ingredient(name=ing) for ing in ingredients],
-                                                            instructions=["See the detailed recipe in the tool output above"]
+                                                            ingredients=ingredients_from_names(ingredients),
+                                                            instructions=_SEE_TOOL_OUTPUT
                                                         )
                                                         
                                                         # If the result is a string, try to parse it for better instructions
@@ -276,15 +794,16 @@ with tab1:
                                                             sections = output['result'].split('\n\n')
                                                             for section in sections:
                                                                 if "instruction" in section.lower() or "step" in section.lower() or section.strip().startswith("1."):
-                                                                    minimal_recipe.instructions = [line.strip() for line in section.split('\n') if line.strip()]
+                                                                    minimal_recipe.instructions = split_lines(section)
                                                         
                                                         st.session_state.recipe_result = minimal_recipe
                                                         
                                                         # Show a warning about the parsing issue
                                                         st.warning("The recipe tool returned a simplified result. Created a basic recipe from available information.")
                                                     else:
-                                                        # Try to parse as a Recipe object
-                                                        st.session_state.recipe_result = Recipe(**output)
+                                                        st.session_state.recipe_result = _parse_recipe_dict(output, inventory_items)
+                                                        if isinstance(output.get('recipe'), dict):
+                                                            st.success("Successfully parsed nested recipe data")
                                             except Exception as e:
                                                 st.warning(f"Could not parse recipe: {str(e)}")
                                                 st.info("Creating a simplified recipe from the output")
@@ -292,139 +811,36 @@ with tab1:
                                                 # Display the raw output for debugging
                                                 st.markdown("**Raw Recipe Creator Output:**")
                                                 if isinstance(output, dict):
-                                                    st.json(output)
+                                                    st.code(_json_text(output, pretty=True), language="json")
                                                 else:
                                                     st.markdown(f"```\n{output}\n```")
                                                 
                                                 # Create a minimal recipe as fallback
                                                 st.session_state.recipe_result = Recipe(
                                                     name="Recipe from Ingredients",
-                                                    ingredients=[Ingredient(name=ing) for ing in ingredients],
-                                                    instructions=["See the detailed recipe in the tool output above"]
+                                                    ingredients=ingredients_from_names(ingredients),
+                                                    instructions=_SEE_TOOL_OUTPUT
                                                 )
                                         
                                         elif tool_name == "health_adapter":
-                                            try:
-                                                if isinstance(output, str):
-                                                    # Keep the existing recipe but note the adaptation
-                                                    if st.session_state.recipe_result:
-                                                        recipe = st.session_state.recipe_result
-                                                        recipe.name = f"{recipe.name} (Health Adapted)"
-                                                        st.session_state.recipe_result = recipe
-                                                elif isinstance(output, dict):
-                                                    # Display the raw output for debugging
-                                                    st.markdown("**Raw Health Adapter Output:**")
-                                                    st.json(output)
-                                                    
-                                                    # Check if output has a nested 'recipe' object
-                                                    if 'recipe' in output and isinstance(output['recipe'], dict):
-                                                        recipe_data = output['recipe']
-                                                        # Try to parse the nested recipe object
-                                                        try:
-                                                            # Ensure ingredients are properly formatted
-                                                            if 'ingredients' in recipe_data and isinstance(recipe_data['ingredients'], list):
-                                                                for i, ingredient in enumerate(recipe_data['ingredients']):
-                                                                    if isinstance(ingredient, str):
-                                                                        # Convert string ingredients to proper format
-                                                                        parts = ingredient.split(' ', 1)
-                                                                        if len(parts) > 1:
-                                                                            quantity = parts[0]
-                                                                            name = parts[1]
-                                                                            recipe_data['ingredients'][i] = {"name": name, "quantity": quantity, "unit": ""}
-                                                                        else:
-                                                                            recipe_data['ingredients'][i] = {"name": ingredient, "quantity": "", "unit": ""}
-                                                            else:
-                                                                recipe_data['ingredients'] = [Ingredient(name=ing) for ing in ingredients]
-                                                            
-                                                            # Now we can continue with the rest of the code
-                                                            recipe_instructions = []
-                                                            if 'instructions' in recipe_data:
-                                                                if isinstance(recipe_data['instructions'], list):
-                                                                    recipe_instructions = recipe_data['instructions']
-                                                                elif isinstance(recipe_data['instructions'], str):
-                                                                    recipe_instructions = [line.strip() for line in recipe_data['instructions'].split('\n') if line.strip()]
-                                                            
-                                                            # If no instructions were found, create a basic one
-                                                            if not recipe_instructions:
-                                                                recipe_instructions = ["Combine all ingredients", "Cook until done", "Serve and enjoy"]
-                                                            
-                                                            # Create a recipe with the extracted information
-                                                            st.session_state.recipe_result = Recipe(
-                                                                name=recipe_data.get('name', f"Recipe with {ingredients[0].capitalize()}"),
-                                                                ingredients=[Ingredient(**ing) for ing in recipe_data['ingredients']],
-                                                                instructions=recipe_instructions,
-                                                                prep_time=recipe_data.get('prep_time'),
-                                                                cook_time=recipe_data.get('cook_time'),
-                                                                servings=recipe_data.get('servings')
-                                                            )
-                                                            st.success("Successfully parsed nested adapted recipe data")
-                                                            # Add adaptation notes if possible
-                                                            if 'name' in recipe_data:
-                                                                adapted_recipe.instructions.append(f"Health Adaptation: Recipe adapted to '{recipe_data['name']}'")
-                                                            st.session_state.recipe_result = adapted_recipe
-                                                        except Exception as e:
-                                                            st.warning(f"Error formatting ingredients: {str(e)}")
-                                                            recipe_data['ingredients'] = [{"name": ing, "quantity": "", "unit": ""} for ing in ingredients]
-                                                        
-                                                        # Now we can continue with the rest of the code
-                                                        recipe_instructions = []
-                                                        if 'instructions' in recipe_data:
-                                                            if isinstance(recipe_data['instructions'], list):
-                                                                recipe_instructions = recipe_data['instructions']
-                                                            elif isinstance(recipe_data['instructions'], str):
-                                                                recipe_instructions = [line.strip() for line in recipe_data['instructions'].split('\n') if line.strip()]
-                                                        
-                                                        # If no instructions were found, create a basic one
-                                                        if not recipe_instructions:
-                                                            recipe_instructions = ["Combine all ingredients", "Cook until done", "Serve and enjoy"]
-                                                        
-                                                        # Create a recipe with the extracted information
-                                                        st.session_state.recipe_result = Recipe(
-                                                            name=recipe_data.get('name', f"Recipe with {ingredients[0].capitalize()}"),
-                                                            ingredients=[Ingredient(**ing) for ing in recipe_data['ingredients']],
-                                                            instructions=recipe_instructions,
-                                                            prep_time=recipe_data.get('prep_time'),
-                                                            cook_time=recipe_data.get('cook_time'),
-                                                            servings=recipe_data.get('servings')
-                                                        )
-                                                        st.success("Successfully parsed nested adapted recipe data")
-                                                        # Add adaptation notes if possible
-                                                        if 'name' in recipe_data:
-                                                            adapted_recipe.instructions.append(f"Health Adaptation: Recipe adapted to '{recipe_data['name']}'")
-                                                        st.session_state.recipe_result = adapted_recipe
-                                                    elif 'result' in output and not all(key in output for key in ['name', 'ingredients', 'instructions']):
-                                                        # Keep the existing recipe but add the adaptation notes
-                                                        if st.session_state.recipe_result:
-                                                            recipe = st.session_state.recipe_result
-                                                            recipe.name = f"{recipe.name} (Health Adapted)"
-                                                            # Add adaptation notes to instructions
-                                                            if isinstance(output['result'], str):
-                                                                recipe.instructions.append(f"Health Adaptation: {output['result']}")
-                                                            st.session_state.recipe_result = recipe
-                                                else:
-                                                    # Try to parse as a Recipe object
-                                                    adapted_recipe = Recipe(**output)
-                                                    st.session_state.health_adapted_recipe = adapted_recipe
-                                                    st.session_state.recipe_result = adapted_recipe
-                                            except Exception as e:
-                                                st.warning(f"Could not parse adapted recipe: {str(e)}")
+                                            if isinstance(output, dict):
                                                 # Display the raw output for debugging
                                                 st.markdown("**Raw Health Adapter Output:**")
-                                                if isinstance(output, dict):
-                                                    st.json(output)
-                                                else:
-                                                    st.markdown(f"```\n{output}\n```")
-                                                
-                                                # Keep the existing recipe but note the adaptation attempt
-                                                if st.session_state.recipe_result:
-                                                    recipe = st.session_state.recipe_result
-                                                    recipe.name = f"{recipe.name} (Health Adapted - parsing failed)"
-                                                    st.session_state.recipe_result = recipe
+                                                st.code(_json_text(output, pretty=True), language="json")
+                                            try:
+                                                # Usually a complete recipe, possibly nested under 'recipe'
+                                                adapted_recipe = Recipe.model_validate(output)
+                                            except ValidationError:
+                                                _fallback_parse_adapted(output, inventory_items)
+                                            except (KeyError, TypeError) as e:
+                                                _note_failed_adaptation(output, e)
+                                            else:
+                                                _store_adapted_recipe(adapted_recipe)
                                         
                                         else:
                                             # For other tools, display the output as is
                                             if isinstance(output, dict):
-                                                st.json(output)
+                                                st.code(_json_text(output, pretty=True), language="json")
                                             elif isinstance(output, str):
                                                 st.markdown(output)
                                             else:
@@ -446,7 +862,7 @@ with tab1:
                                     st.warning("No recipe was created by the tools. Creating a recipe directly...")
                                     try:
                                         # Create a recipe directly using the recipe_creator tool
-                                        direct_recipe = recipe_creator(ingredients, {"description": recipe_preferences} if recipe_preferences else None)
+                                        direct_recipe = _cached_recipe(inventory_items, recipe_preferences)
                                         st.session_state.recipe_result = direct_recipe
                                         st.success("Recipe created directly!")
                                     except Exception as e:
@@ -454,8 +870,8 @@ with tab1:
                                         # Create a minimal recipe as last resort
                                         st.session_state.recipe_result = Recipe(
                                             name=f"Simple {ingredients[0].capitalize()} Recipe",
-                                            ingredients=[Ingredient(name=ing) for ing in ingredients],
-                                            instructions=["Combine all ingredients", "Cook until done", "Serve and enjoy"]
+                                            ingredients=ingredients_from_names(ingredients),
+                                            instructions=DEFAULT_INSTRUCTIONS
                                         )
                                 
                                 st.success("🎉 Recipe creation process complete!")
@@ -471,7 +887,7 @@ with tab1:
                                 fallback_query += f" Dietary restrictions: {', '.join(restrictions)}."
                         
                         try:
-                            result = chef_agent(fallback_query)
+                            result = _cached_chef_agent(fallback_query)
                             if isinstance(result, dict) and "final_result" in result:
                                 st.markdown(result["final_result"])
                             else:
@@ -481,185 +897,7 @@ with tab1:
                             st.markdown("Please try again with different ingredients or preferences.")
     
     # Display final recipe if available
-    if st.session_state.recipe_result:
-        st.markdown("---")
-        
-        # Create a nice card-like container for the recipe
-        recipe_container = st.container()
-        with recipe_container:
-            # Add some styling
-            st.markdown("""
-            <style>
-            .recipe-card {
-                background-color: #f8f9fa;
-                border-radius: 10px;
-                padding: 20px;
-                box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-            }
-            .recipe-title {
-                color: #4b6584;
-                text-align: center;
-                margin-bottom: 20px;
-            }
-            </style>
-            """, unsafe_allow_html=True)
-            
-            # Start the recipe card
-            st.markdown("<div class='recipe-card'>", unsafe_allow_html=True)
-            st.markdown("<div class='recipe-title'>📝 Your Final Recipe</div>", unsafe_allow_html=True)
-            
-            st.subheader(st.session_state.recipe_result.name)
-            
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.write("**Preparation Time:**", f"{st.session_state.recipe_result.prep_time} minutes" if st.session_state.recipe_result.prep_time else "Not specified")
-            with col2:
-                st.write("**Cooking Time:**", f"{st.session_state.recipe_result.cook_time} minutes" if st.session_state.recipe_result.cook_time else "Not specified")
-            with col3:
-                st.write("**Servings:**", st.session_state.recipe_result.servings or "Not specified")
-            
-            st.subheader("Ingredients")
-            for ing in st.session_state.recipe_result.ingredients:
-                if isinstance(ing, dict):
-                    quantity = ing.get('quantity', '')
-                    unit = ing.get('unit', '')
-                    name = ing.get('name', '')
-                    st.write(f"- {quantity} {unit} {name}")
-                else:
-                    quantity = getattr(ing, 'quantity', '') or ''
-                    unit = getattr(ing, 'unit', '') or ''
-                    name = getattr(ing, 'name', str(ing))
-                    st.write(f"- {quantity} {unit} {name}")
-            
-            st.subheader("Instructions")
-            for i, step in enumerate(st.session_state.recipe_result.instructions):
-                st.write(f"{i+1}. {step}")
-            
-            # Add a section to display the raw recipe data for debugging
-            with st.expander("Debug: Raw Recipe Data"):
-                st.json(st.session_state.recipe_result.__dict__)
-            
-            if st.session_state.recipe_result.nutrition:
-                st.subheader("Nutrition Information")
-                
-                # Display key nutrition facts in a more readable format
-                if isinstance(st.session_state.recipe_result.nutrition, dict):
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        st.write("**Calories:**", st.session_state.recipe_result.nutrition.get("calories", "Not available"))
-                        st.write("**Protein:**", st.session_state.recipe_result.nutrition.get("protein", "Not available"))
-                        st.write("**Carbs:**", st.session_state.recipe_result.nutrition.get("carbs", "Not available"))
-                    
-                    with col2:
-                        st.write("**Fat:**", st.session_state.recipe_result.nutrition.get("fat", "Not available"))
-                        st.write("**Fiber:**", st.session_state.recipe_result.nutrition.get("fiber", "Not available"))
-                        st.write("**Sugar:**", st.session_state.recipe_result.nutrition.get("sugar", "Not available"))
-                    
-                    # Show full nutrition details in an expander
-                    with st.expander("View Full Nutrition Details"):
-                        st.json(st.session_state.recipe_result.nutrition)
-                else:
-                    st.json(st.session_state.recipe_result.nutrition)
-            
-            # Add a button to prepare the dish
-            if st.button("Prepare This Dish"):
-                with st.spinner("Creating detailed preparation guide..."):
-                    try:
-                        # Get health goals if specified
-                        health_goal = None
-                        if use_health_goals and goal_type != "None":
-                            health_goal = goal_type
-                        
-                        # Call the dish preparer tool
-                        preparation_result = dish_preparer(
-                            st.session_state.recipe_result,
-                            health_goal,
-                            restrictions if restrictions else None
-                        )
-                        
-                        # Store the result
-                        st.session_state.preparation_guide = preparation_result
-                        st.success("Preparation guide created!")
-                        st.experimental_rerun()
-                    except Exception as e:
-                        st.error(f"Error creating preparation guide: {str(e)}")
-            
-            # Display preparation guide if available
-            if st.session_state.preparation_guide:
-                st.markdown("</div>", unsafe_allow_html=True)  # Close the recipe card
-                
-                # Create a new card for the preparation guide
-                st.markdown("<div class='recipe-card'>", unsafe_allow_html=True)
-                
-                # Display the technique name prominently
-                prep_guide = st.session_state.preparation_guide
-                technique_name = prep_guide.get('technique_name', "Chef's Preparation Guide")
-                
-                st.markdown(f"<div class='recipe-title'>👨‍🍳 {technique_name}</div>", unsafe_allow_html=True)
-                
-                # Display recipe name
-                st.markdown(f"### For: {prep_guide['recipe_name']}")
-                
-                # Display health considerations if any
-                if prep_guide['health_considerations']:
-                    st.markdown(f"**Health Focus:** {prep_guide['health_considerations']}")
-                
-                # Display dietary restrictions if any
-                if prep_guide['dietary_restrictions']:
-                    st.markdown(f"**Dietary Restrictions:** {', '.join(prep_guide['dietary_restrictions'])}")
-                
-                # Create tabs for different sections of the preparation guide
-                prep_tabs = st.tabs(["Full Guide", "Preparation Steps", "Cooking Tips", "Presentation"])
-                
-                with prep_tabs[0]:
-                    # Display the full preparation guide with markdown formatting
-                    st.markdown(prep_guide['preparation_guide'])
-                
-                with prep_tabs[1]:
-                    # Try to extract preparation steps section
-                    guide_text = prep_guide['preparation_guide']
-                    if "Preparation" in guide_text or "Steps" in guide_text:
-                        sections = guide_text.split("##")
-                        for section in sections:
-                            if "Preparation" in section or "Steps" in section or "Instructions" in section:
-                                st.markdown(f"## {section}")
-                                break
-                    else:
-                        st.markdown("See the Full Guide tab for preparation steps.")
-                
-                with prep_tabs[2]:
-                    # Try to extract cooking tips section
-                    guide_text = prep_guide['preparation_guide']
-                    if "Tips" in guide_text or "Techniques" in guide_text:
-                        sections = guide_text.split("##")
-                        for section in sections:
-                            if "Tips" in section or "Techniques" in section:
-                                st.markdown(f"## {section}")
-                                break
-                    else:
-                        st.markdown("See the Full Guide tab for cooking tips.")
-                
-                with prep_tabs[3]:
-                    # Try to extract presentation section
-                    guide_text = prep_guide['preparation_guide']
-                    if "Presentation" in guide_text or "Plating" in guide_text or "Serving" in guide_text:
-                        sections = guide_text.split("##")
-                        for section in sections:
-                            if "Presentation" in section or "Plating" in section or "Serving" in section:
-                                st.markdown(f"## {section}")
-                                break
-                    else:
-                        st.markdown("See the Full Guide tab for presentation suggestions.")
-                
-                # Button to clear the preparation guide
-                if st.button("Clear Preparation Guide"):
-                    st.session_state.preparation_guide = None
-                    st.experimental_rerun()
-                
-                st.markdown("</div>", unsafe_allow_html=True)
-            else:
-                st.markdown("</div>", unsafe_allow_html=True)  # Close the recipe card
+    recipe_card()
 
 with tab2:
     st.header("Create a Meal Plan")
@@ -675,138 +913,41 @@ with tab2:
     )
     
     if st.button("Create Meal Plan", key="create_meal_plan"):
-        if not inventory_text.strip():
+        if not inventory_items:
             st.error("Please add some ingredients to your inventory first!")
         else:
-            with st.spinner("Creating your meal plan..."):
-                ingredients = [ing.strip() for ing in inventory_text.splitlines() if ing.strip()]
-                
-                try:
-                    # First analyze the inventory
-                    inventory_analysis = inventory_analyzer(ingredients)
-                    st.success("✅ Inventory analyzed")
-                    
-                    # Create health goal if needed
-                    health_goal = None
-                    if use_health_goals and goal_type != "None":
-                        health_goal = HealthGoal(
-                            goal_type=goal_type,
-                            restrictions=restrictions if restrictions else None
-                        )
-                    
-                    # Create the meal plan
-                    try:
-                        meal_plan = meal_planner(ingredients, days, meals_per_day, health_goal)
-                        # Store the result and display success
-                        st.session_state.meal_plan_result = meal_plan
-                        st.success("✅ Meal plan created successfully!")
-                    except Exception as meal_plan_error:
-                        st.warning(f"Error in meal planner: {str(meal_plan_error)}")
-                        st.info("Creating a simplified meal plan...")
-                        
-                        # Create a simplified meal plan as fallback
-                        simplified_recipes = []
-                        for day in range(1, days + 1):
-                            for meal in range(1, meals_per_day + 1):
-                                meal_type = ["Breakfast", "Lunch", "Dinner"][meal % 3]
-                                simplified_recipes.append({
-                                    "day": day,
-                                    "meal_type": meal_type,
-                                    "name": f"Simple {meal_type} with {', '.join(ingredients[:3])}",
-                                    "description": "A simple meal using available ingredients",
-                                    "main_ingredients": ingredients[:5],
-                                    "nutrition": "Not available"
-                                })
-                        
-                        from recipe_agent import MealPlan
-                        simplified_meal_plan = MealPlan(
-                            days=days,
-                            meals_per_day=meals_per_day,
-                            recipes=simplified_recipes,
-                            nutrition_summary={"note": "Simplified meal plan - detailed nutrition not available"}
-                        )
-                        st.session_state.meal_plan_result = simplified_meal_plan
-                        st.success("✅ Simplified meal plan created")
-                        
-                except Exception as e:
-                    st.error(f"Error creating meal plan: {str(e)}")
-                    st.info("Falling back to the general chef agent...")
-                    
-                    # Fallback to the general agent
-                    query = f"Create a {days}-day meal plan with {meals_per_day} meals per day using these ingredients: {', '.join(ingredients)}."
-                    if meal_plan_notes:
-                        query += f" Notes: {meal_plan_notes}."
-                    if use_health_goals:
-                        query += f" Health goal: {goal_type}."
-                        if restrictions:
-                            query += f" Dietary restrictions: {', '.join(restrictions)}."
-                    
-                    result = chef_agent(query)
-                    if isinstance(result, dict) and "final_result" in result:
-                        st.session_state.meal_plan_result = result["final_result"]
-                    else:
-                        st.session_state.meal_plan_result = str(result)
+            # Fallback prompt for the general agent if the meal-plan tools fail
+            query = f"Create a {days}-day meal plan with {meals_per_day} meals per day using these ingredients: {', '.join(inventory_items)}."
+            if meal_plan_notes:
+                query += f" Notes: {meal_plan_notes}."
+            if use_health_goals:
+                query += f" Health goal: {goal_type}."
+                if restrictions:
+                    query += f" Dietary restrictions: {', '.join(restrictions)}."
+            
+            # The inventory analysis and the meal plan are independent LLM calls, so
+            # both run in the background at once; meal_plan_progress polls them
+            executor = _tool_executor()
+            st.session_state.meal_plan_job = {
+                "inventory": executor.submit(_cached_inventory_analysis, inventory_items),
+                "plan": executor.submit(
+                    _cached_meal_plan, inventory_items, days, meals_per_day,
+                    goal_type if goal_type != "None" else None, tuple(restrictions)
+                ),
+                "ingredients": list(inventory_items),
+                "days": days,
+                "meals_per_day": meals_per_day,
+                "fallback_query": query
+            }
+    
+    # Show progress while a meal plan is generated, then how it went
+    if st.session_state.get("meal_plan_job") is not None:
+        meal_plan_progress()
+    for level, message in st.session_state.pop("meal_plan_notices", []):
+        getattr(st, level)(message)
     
     # Display meal plan if available
-    if st.session_state.meal_plan_result:
-        st.markdown("---")
-        st.header("📅 Your Meal Plan")
-        
-        if isinstance(st.session_state.meal_plan_result, str):
-            # If it's a string (from the fallback), just display it
-            st.markdown(st.session_state.meal_plan_result)
-        else:
-            # If it's a MealPlan object, format it nicely
-            meal_plan = st.session_state.meal_plan_result
-            
-            st.write(f"**{meal_plan.days}-Day Meal Plan with {meal_plan.meals_per_day} meals per day**")
-            
-            # Display each day's meals
-            for day_idx in range(meal_plan.days):
-                st.subheader(f"Day {day_idx + 1}")
-                
-                # Get meals for this day
-                day_meals = [meal for meal in meal_plan.recipes 
-                            if meal.get("day", 0) == day_idx + 1 or 
-                               meal.get("day_index", 0) == day_idx]
-                
-                if not day_meals:
-                    # If day information is not available, divide recipes evenly
-                    start_idx = day_idx * meal_plan.meals_per_day
-                    end_idx = start_idx + meal_plan.meals_per_day
-                    day_meals = meal_plan.recipes[start_idx:end_idx]
-                
-                # Display each meal
-                for meal_idx, meal in enumerate(day_meals[:meal_plan.meals_per_day]):
-                    meal_name = meal.get("name", f"Meal {meal_idx + 1}")
-                    meal_type = meal.get("meal_type", ["Breakfast", "Lunch", "Dinner"][meal_idx % 3])
-                    
-                    with st.expander(f"{meal_type}: {meal_name}", expanded=True):
-                        st.write("**Description:**", meal.get("description", "No description available"))
-                        
-                        st.write("**Main Ingredients:**")
-                        ingredients = meal.get("ingredients", meal.get("main_ingredients", []))
-                        if isinstance(ingredients, list):
-                            for ing in ingredients:
-                                if isinstance(ing, dict):
-                                    st.write(f"- {ing.get('quantity', '')} {ing.get('unit', '')} {ing.get('name', '')}")
-                                else:
-                                    st.write(f"- {ing}")
-                        else:
-                            st.write(ingredients)
-                        
-                        if "nutrition" in meal:
-                            st.write("**Nutrition:**", meal["nutrition"])
-            
-            # Display nutrition summary if available
-            if meal_plan.nutrition_summary:
-                st.subheader("Nutrition Summary")
-                st.json(meal_plan.nutrition_summary)
-        
-        # Button to clear the meal plan
-        if st.button("Clear Meal Plan"):
-            st.session_state.meal_plan_result = None
-            st.experimental_rerun()
+    meal_plan_view()
 
 with tab3:
     st.header("Analyze Recipe Nutrition")
@@ -828,22 +969,14 @@ with tab3:
                         query += f" with {', '.join(restrictions)} restrictions"
                     query += "."
                 
-                result = chef_agent(query)
+                result = _cached_chef_agent(query)
                 if isinstance(result, dict) and "final_result" in result:
                     st.session_state.nutrition_result = result["final_result"]
                 else:
                     st.session_state.nutrition_result = str(result)
     
     # Display nutrition analysis if available
-    if st.session_state.nutrition_result:
-        st.markdown("---")
-        st.header("🔬 Nutrition Analysis")
-        st.markdown(st.session_state.nutrition_result)
-        
-        # Button to clear the nutrition analysis
-        if st.button("Clear Nutrition Analysis"):
-            st.session_state.nutrition_result = None
-            st.experimental_rerun()
+    nutrition_view()
 
 # Footer
 st.markdown("---")
@@ -1,22 +1,56 @@
 import os
-from typing import List, Dict, Any, Optional
-from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Iterator, Optional
+from pydantic import BaseModel, Field, TypeAdapter, ValidationInfo, model_validator
+from pydantic.dataclasses import dataclass
 import openai
 from dotenv import load_dotenv
+import copy
 import json
+import math
+import re
+import threading
+from functools import lru_cache
+
+# orjson parses the agent's JSON replies faster; fall back to the stdlib
+try:
+    from orjson import dumps as json_dumps, loads as json_loads
+except ImportError:
+    from json import dumps as json_dumps, loads as json_loads
 
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# The OpenAI client (and its HTTP connection pool) is created on first use and
+# shared by every tool and session in the process; importing this module for the
+# data models alone does not need an API key
+@lru_cache(maxsize=None)
+def get_client() -> openai.OpenAI:
+    return openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+# Fallback steps for recipes the LLM returned without instructions; pydantic
+# copies the tuple into a fresh list for every Recipe
+DEFAULT_INSTRUCTIONS = ("Combine all ingredients", "Cook until done", "Serve and enjoy")
+
+def split_lines(text: str) -> List[str]:
+    """Return the stripped, non-blank lines of an LLM text block."""
+    return [line for line in (raw.strip() for raw in text.splitlines()) if line]
 
 # Define data models
-class Ingredient(BaseModel):
+# Recipes hold many ingredients, so Ingredient is a slotted pydantic dataclass:
+# no per-instance __dict__, but the same validation and JSON output as a model
+@dataclass(slots=True)
+class Ingredient:
     name: str
     quantity: Optional[str] = None
     unit: Optional[str] = None
     
+# Validates a whole ingredient list in one pydantic-core call
+_INGREDIENT_LIST = TypeAdapter(List[Ingredient])
+
+def ingredients_from_names(names) -> List[Ingredient]:
+    """Build Ingredient models for plain ingredient names."""
+    return _INGREDIENT_LIST.validate_python([{"name": name} for name in names])
+
 class Recipe(BaseModel):
     name: str
     ingredients: List[Ingredient]
@@ -26,6 +60,46 @@ class Recipe(BaseModel):
     servings: Optional[int] = None
     nutrition: Optional[Dict[str, Any]] = None
 
+    @model_validator(mode="before")
+    @classmethod
+    def _coerce(cls, data: Any, info: ValidationInfo) -> Any:
+        """Normalize LLM recipe JSON: unwrap a nested 'recipe' object and split
+        string ingredients/instructions. With a ``fallback_ingredients`` context,
+        missing fields are filled from the user's ingredients."""
+        if not isinstance(data, dict):
+            return data
+        if isinstance(data.get("recipe"), dict):
+            data = data["recipe"]
+        data = dict(data)
+
+        ingredients = data.get("ingredients")
+        if isinstance(ingredients, str):
+            ingredients = split_lines(ingredients)
+        if isinstance(ingredients, list):
+            normalized = []
+            for ingredient in ingredients:
+                if isinstance(ingredient, str):
+                    # "2 onions" -> quantity "2", name "onions"
+                    quantity, sep, name = ingredient.partition(" ")
+                    if sep:
+                        ingredient = {"name": name, "quantity": quantity, "unit": ""}
+                    else:
+                        ingredient = {"name": ingredient, "quantity": "", "unit": ""}
+                normalized.append(ingredient)
+            data["ingredients"] = normalized
+
+        if isinstance(data.get("instructions"), str):
+            data["instructions"] = split_lines(data["instructions"])
+
+        fallback = (info.context or {}).get("fallback_ingredients")
+        if fallback:
+            data.setdefault("name", f"Recipe with {fallback[0].capitalize()}")
+            if not data.get("ingredients"):
+                data["ingredients"] = [{"name": ing} for ing in fallback]
+            if not data.get("instructions"):
+                data["instructions"] = DEFAULT_INSTRUCTIONS
+        return data
+
 class HealthGoal(BaseModel):
     goal_type: str = Field(..., description="Type of health goal (e.g., 'weight_loss', 'muscle_gain', 'heart_health')")
     restrictions: Optional[List[str]] = Field(None, description="Dietary restrictions (e.g., 'gluten-free', 'dairy-free')")
@@ -40,6 +114,41 @@ class MealPlan(BaseModel):
     recipes: List[Dict[str, Any]]
     nutrition_summary: Optional[Dict[str, Any]] = None
 
+class SemanticCache:
+    """Reuses agent responses for near-identical free-text preferences. Entries
+    only match within the same scope, an exact key for the structured request
+    (ingredients, health goals), so a changed ingredient or goal always misses."""
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 256, model: str = "text-embedding-3-small"):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.model = model
+        self._entries = []  # (scope, unit vector, response JSON), oldest first
+        self._lock = threading.Lock()
+
+    def embed(self, text: str) -> List[float]:
+        vector = get_client().embeddings.create(model=self.model, input=text).data[0].embedding
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def lookup(self, scope: str, vector: List[float]) -> Optional[Dict[str, Any]]:
+        """Return a copy of the closest cached response in scope above the threshold, if any."""
+        best_score, best_json = self.threshold, None
+        with self._lock:
+            for cached_scope, cached_vector, response_json in self._entries:
+                if cached_scope != scope:
+                    continue
+                score = sum(a * b for a, b in zip(vector, cached_vector))
+                if score >= best_score:
+                    best_score, best_json = score, response_json
+        return json_loads(best_json) if best_json is not None else None
+
+    def store(self, scope: str, vector: List[float], response: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries.append((scope, vector, json_dumps(response)))
+            if len(self._entries) > self.max_entries:
+                self._entries.pop(0)
+
 # Tool functions
 def inventory_analyzer(inventory: List[str]) -> Dict[str, Any]:
     """Analyzes kitchen inventory and categorizes ingredients."""
@@ -62,7 +171,7 @@ def inventory_analyzer(inventory: List[str]) -> Dict[str, Any]:
     Provide your response as a structured JSON with categories and dish suggestions.
     """
     
-    response = client.chat.completions.create(
+    response = get_client().chat.completions.create(
         model="gpt-4o",
         response_format={"type": "json_object"},
         messages=[
@@ -71,7 +180,7 @@ def inventory_analyzer(inventory: List[str]) -> Dict[str, Any]:
         ]
     )
     
-    return eval(response.choices[0].message.content)
+    return json_loads(response.choices[0].message.content)
 
 def recipe_creator(ingredients: List[str], preferences: Optional[Dict[str, Any]] = None, health_goals: Optional[Dict[str, Any]] = None) -> Recipe:
     """Creates a recipe based on available ingredients, preferences, and health goals."""
@@ -124,7 +233,7 @@ def recipe_creator(ingredients: List[str], preferences: Optional[Dict[str, Any]]
     Do not include any text outside of this JSON structure.
     """
     
-    response = client.chat.completions.create(
+    response = get_client().chat.completions.create(
         model="gpt-3.5-turbo",
         response_format={"type": "json_object"},
         messages=[
@@ -134,26 +243,8 @@ def recipe_creator(ingredients: List[str], preferences: Optional[Dict[str, Any]]
     )
     
     try:
-        recipe_data = json.loads(response.choices[0].message.content)
-        
-        # Check if the response has a nested 'recipe' object
-        if 'recipe' in recipe_data:
-            recipe_data = recipe_data['recipe']
-        
-        # Ensure ingredients are properly formatted
-        if 'ingredients' in recipe_data and isinstance(recipe_data['ingredients'], list):
-            for i, ingredient in enumerate(recipe_data['ingredients']):
-                if isinstance(ingredient, str):
-                    # Convert string ingredients to proper format
-                    parts = ingredient.split(' ', 1)
-                    if len(parts) > 1:
-                        quantity = parts[0]
-                        name = parts[1]
-                        recipe_data['ingredients'][i] = {"name": name, "quantity": quantity, "unit": ""}
-                    else:
-                        recipe_data['ingredients'][i] = {"name": ingredient, "quantity": "", "unit": ""}
-        
-        return Recipe(**recipe_data)
+        # The Recipe validator unwraps nested 'recipe' objects and splits string ingredients
+        return Recipe.model_validate_json(response.choices[0].message.content)
     except Exception as e:
         print(f"Error parsing recipe data: {e}")
         print(f"Raw response: {response.choices[0].message.content}")
@@ -161,8 +252,8 @@ def recipe_creator(ingredients: List[str], preferences: Optional[Dict[str, Any]]
         # Create a minimal valid recipe as fallback
         return Recipe(
             name=f"Quick {ingredients[0].capitalize()} Recipe",
-            ingredients=[Ingredient(name=ing) for ing in ingredients],
-            instructions=["Combine all ingredients", "Cook until done", "Serve and enjoy"]
+            ingredients=ingredients_from_names(ingredients),
+            instructions=DEFAULT_INSTRUCTIONS
         )
 
 def nutrition_analyzer(recipe: Recipe) -> Dict[str, Any]:
@@ -198,7 +289,7 @@ def nutrition_analyzer(recipe: Recipe) -> Dict[str, Any]:
     }}
     """
     
-    response = client.chat.completions.create(
+    response = get_client().chat.completions.create(
         model="gpt-3.5-turbo",
         response_format={"type": "json_object"},
         messages=[
@@ -208,7 +299,7 @@ def nutrition_analyzer(recipe: Recipe) -> Dict[str, Any]:
     )
     
     try:
-        nutrition_data = json.loads(response.choices[0].message.content)
+        nutrition_data = json_loads(response.choices[0].message.content)
         return nutrition_data
     except Exception as e:
         print(f"Error parsing nutrition data: {e}")
@@ -264,7 +355,7 @@ def health_adapter(recipe: Recipe, health_goal: HealthGoal) -> Recipe:
     }}
     """
     
-    response = client.chat.completions.create(
+    response = get_client().chat.completions.create(
         model="gpt-3.5-turbo",
         response_format={"type": "json_object"},
         messages=[
@@ -274,26 +365,8 @@ def health_adapter(recipe: Recipe, health_goal: HealthGoal) -> Recipe:
     )
     
     try:
-        recipe_data = json.loads(response.choices[0].message.content)
-        
-        # Check if the response has a nested 'recipe' object
-        if 'recipe' in recipe_data:
-            recipe_data = recipe_data['recipe']
-            
-        # Ensure ingredients are properly formatted
-        if 'ingredients' in recipe_data and isinstance(recipe_data['ingredients'], list):
-            for i, ingredient in enumerate(recipe_data['ingredients']):
-                if isinstance(ingredient, str):
-                    # Convert string ingredients to proper format
-                    parts = ingredient.split(' ', 1)
-                    if len(parts) > 1:
-                        quantity = parts[0]
-                        name = parts[1]
-                        recipe_data['ingredients'][i] = {"name": name, "quantity": quantity, "unit": ""}
-                    else:
-                        recipe_data['ingredients'][i] = {"name": ingredient, "quantity": "", "unit": ""}
-        
-        return Recipe(**recipe_data)
+        # The Recipe validator unwraps nested 'recipe' objects and splits string ingredients
+        return Recipe.model_validate_json(response.choices[0].message.content)
     except Exception as e:
         print(f"Error parsing adapted recipe data: {e}")
         # Return the original recipe if adaptation fails
@@ -331,7 +404,7 @@ def meal_planner(inventory: List[str], days: int, meals_per_day: int, health_goa
     Format your response as a structured JSON that can be parsed into a MealPlan object.
     """
     
-    response = client.chat.completions.create(
+    response = get_client().chat.completions.create(
         model="gpt-4o",
         response_format={"type": "json_object"},
         messages=[
@@ -340,8 +413,8 @@ def meal_planner(inventory: List[str], days: int, meals_per_day: int, health_goa
         ]
     )
     
-    meal_plan_data = eval(response.choices[0].message.content)
-    return MealPlan(**meal_plan_data)
+    # Parse and validate the reply in one pydantic-core call (never eval model output)
+    return MealPlan.model_validate_json(response.choices[0].message.content)
 
 def dish_preparer(recipe, health_goals=None, dietary_restrictions=None):
     """
@@ -388,7 +461,7 @@ def dish_preparer(recipe, health_goals=None, dietary_restrictions=None):
         prompt += f"\n\nEnsure the preparation follows these dietary restrictions: {', '.join(dietary_restrictions)}"
     
     # Get response from OpenAI
-    response = client.chat.completions.create(
+    response = get_client().chat.completions.create(
         model="gpt-4-turbo",
         messages=[
             {"role": "system", "content": "You are a professional chef providing detailed cooking instructions."},
@@ -401,9 +474,9 @@ def dish_preparer(recipe, health_goals=None, dietary_restrictions=None):
     
     # Extract a technique name from the first line if possible
     technique_name = "Chef's Preparation Guide"
-    lines = preparation_guide.split('\n')
-    if lines and len(lines[0]) < 100 and ("#" in lines[0] or ":" in lines[0] or "technique" in lines[0].lower() or "method" in lines[0].lower()):
-        technique_name = lines[0].replace("#", "").strip()
+    first_line = preparation_guide.partition('\n')[0]
+    if len(first_line) < 100 and ("#" in first_line or ":" in first_line or "technique" in first_line.lower() or "method" in first_line.lower()):
+        technique_name = first_line.replace("#", "").strip()
     
     return {
         "recipe_name": recipe.name,
@@ -413,12 +486,7 @@ def dish_preparer(recipe, health_goals=None, dietary_restrictions=None):
         "dietary_restrictions": dietary_restrictions
     }
 
-def chef_agent(user_input: str) -> Dict[str, Any]:
-    """
-    Main agent function that orchestrates the tools based on user input.
-    """
-    
-    system_prompt = """
+CHEF_AGENT_SYSTEM_PROMPT = """
     You are ChefGPT, an expert culinary assistant with the combined knowledge of a professional chef, nutritionist, and home cook.
     
     Available Tools:
@@ -471,6 +539,7 @@ def chef_agent(user_input: str) -> Dict[str, Any]:
     - For nutrition questions, use nutrition_analyzer on the recipe
     - use dish_preparer on the recipe to get detailed cooking instructions
     - Always consider the logical flow of information between tools
+    - If the request has an "available_tools" list, only use the tools it names
     
     IMPORTANT: You must return your response in valid JSON format with this exact structure:
     {
@@ -488,71 +557,169 @@ def chef_agent(user_input: str) -> Dict[str, Any]:
     
     Do not include any explanatory text outside of the JSON structure.
     """
-    
-    messages = [
-        {"role": "system", "content": system_prompt},
+
+def _normalize_step(step: Dict[str, Any], user_input: str) -> Dict[str, Any]:
+    """Parse string tool outputs and attach the query's health goals to recipe_creator."""
+    if "output" in step and isinstance(step["output"], str):
+        # Try to parse string output as JSON
+        try:
+            step["output"] = json_loads(step["output"])
+        except:
+            # If parsing fails, keep as string but wrap in a dict
+            step["output"] = {"text_output": step["output"]}
+
+    if step.get("tool_name") == "recipe_creator":
+        # Extract health goals from the input if available
+        input_params = step.get("input", {})
+        if "health_goals" not in input_params and "health_goal" in user_input.lower():
+            # Try to extract health goals from the query
+            try:
+                query_data = json_loads(user_input)
+                if "health_goals" in query_data:
+                    input_params["health_goals"] = query_data["health_goals"]
+                    step["input"] = input_params
+            except:
+                pass
+    return step
+
+# Request settings shared by chef_agent and chef_agent_stream. The system prompt
+# is a constant that comes first and the cache key routes every agent call to the
+# same shard, but OpenAI only caches prefixes of 1024 tokens or more: at about
+# 800 tokens this prompt is not cached yet. Keep anything per-request (dates,
+# user data) out of it so caching applies once it grows past that size.
+_AGENT_REQUEST = {
+    "model": "gpt-4o",
+    "temperature": 0.7,
+    "max_tokens": 2000,
+    "response_format": {"type": "json_object"},
+    "extra_body": {"prompt_cache_key": "chef_agent"},
+}
+
+def _agent_messages(user_input: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": CHEF_AGENT_SYSTEM_PROMPT},
         {"role": "user", "content": user_input}
     ]
-    
+
+def _parse_agent_content(content: str, user_input: str) -> Dict[str, Any]:
+    """Parse the agent's JSON reply, falling back to a plain-text response."""
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",  # Upgraded to GPT-4o for better reasoning
-            messages=messages,
-            temperature=0.7,
-            max_tokens=2000,
-            response_format={"type": "json_object"}
-        )
-        
-        try:
-            # Try to parse as JSON
-            result = json.loads(response.choices[0].message.content)
-            
-            # Process tool_sequence to ensure outputs are properly formatted
-            if "tool_sequence" in result:
-                for i, step in enumerate(result["tool_sequence"]):
-                    if "output" in step and isinstance(step["output"], str):
-                        # Try to parse string output as JSON
-                        try:
-                            result["tool_sequence"][i]["output"] = json.loads(step["output"])
-                        except:
-                            # If parsing fails, keep as string but wrap in a dict
-                            result["tool_sequence"][i]["output"] = {"text_output": step["output"]}
-            
-            # Modify tool_sequence to include health goals
-            if "tool_sequence" in result:
-                for i, step in enumerate(result["tool_sequence"]):
-                    if step["tool_name"] == "recipe_creator":
-                        # Extract health goals from the input if available
-                        input_params = step.get("input", {})
-                        if "health_goals" not in input_params and "health_goal" in user_input.lower():
-                            # Try to extract health goals from the query
-                            try:
-                                query_data = json.loads(user_input)
-                                if "health_goals" in query_data:
-                                    input_params["health_goals"] = query_data["health_goals"]
-                                    result["tool_sequence"][i]["input"] = input_params
-                            except:
-                                pass
-            
-            return result
-        except json.JSONDecodeError as e:
-            # If JSON parsing fails, return a formatted fallback response
-            content = response.choices[0].message.content
-            print(f"JSON parse error: {e}")
-            print(f"Raw content: {content}")
-            return {
-                "reasoning": "Direct response from assistant (JSON parsing failed)",
-                "tool_sequence": [],
-                "final_result": content
-            }
-    except Exception as e:
-        # Handle any API errors
-        print(f"Error calling OpenAI API: {str(e)}")
+        result = json_loads(content)
+    except json.JSONDecodeError as e:
+        # If JSON parsing fails, return a formatted fallback response
+        print(f"JSON parse error: {e}")
+        print(f"Raw content: {content}")
         return {
-            "reasoning": f"Error occurred: {str(e)}",
+            "reasoning": "Direct response from assistant (JSON parsing failed)",
             "tool_sequence": [],
-            "final_result": f"Sorry, an error occurred: {str(e)}"
+            "final_result": content
         }
+    for step in result.get("tool_sequence", []):
+        _normalize_step(step, user_input)
+    return result
+
+def _error_response(e: Exception) -> Dict[str, Any]:
+    # Handle any API errors
+    print(f"Error calling OpenAI API: {str(e)}")
+    return {
+        "reasoning": f"Error occurred: {str(e)}",
+        "tool_sequence": [],
+        "final_result": f"Sorry, an error occurred: {str(e)}"
+    }
+
+def chef_agent(user_input: str) -> Dict[str, Any]:
+    """
+    Main agent function that orchestrates the tools based on user input.
+    """
+    try:
+        response = get_client().chat.completions.create(
+            messages=_agent_messages(user_input),
+            **_AGENT_REQUEST
+        )
+        return _parse_agent_content(response.choices[0].message.content, user_input)
+    except Exception as e:
+        return _error_response(e)
+
+class _AgentStreamParser:
+    """Pulls the reasoning and each completed tool_sequence step out of a partial JSON reply."""
+
+    _REASONING_RE = re.compile(r'"reasoning"\s*:\s*')
+    _SEQUENCE_RE = re.compile(r'"tool_sequence"\s*:\s*\[')
+
+    def __init__(self):
+        self.buffer = ""
+        self.reasoning = None
+        self.steps = []
+        self._decoder = json.JSONDecoder()
+        self._pos = None  # next unread position inside the tool_sequence array
+        self._done = False
+
+    def feed(self, text: str) -> None:
+        self.buffer += text
+        if self.reasoning is None:
+            match = self._REASONING_RE.search(self.buffer)
+            if match:
+                try:
+                    self.reasoning, _ = self._decoder.raw_decode(self.buffer, match.end())
+                except json.JSONDecodeError:
+                    pass
+        if self._pos is None and not self._done:
+            match = self._SEQUENCE_RE.search(self.buffer)
+            if match:
+                self._pos = match.end()
+        while self._pos is not None:
+            pos = self._pos
+            while pos < len(self.buffer) and self.buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(self.buffer):
+                break
+            if self.buffer[pos] == "]":
+                self._pos, self._done = None, True
+                break
+            try:
+                step, self._pos = self._decoder.raw_decode(self.buffer, pos)
+            except json.JSONDecodeError:
+                break  # the step is still streaming
+            self.steps.append(step)
+
+def chef_agent_stream(user_input: str) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming variant of chef_agent.
+
+    Yields {"type": "reasoning"} first, then {"type": "step", "index": i} for each
+    tool step as soon as it has been generated, and finally {"type": "final"} with
+    the complete response (as chef_agent would return it).
+    """
+    parser = _AgentStreamParser()
+    emitted_reasoning, emitted_steps = False, 0
+    try:
+        stream = get_client().chat.completions.create(
+            messages=_agent_messages(user_input),
+            stream=True,
+            **_AGENT_REQUEST
+        )
+        for chunk in stream:
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            parser.feed(chunk.choices[0].delta.content)
+            # Steps wait for the reasoning so events always arrive in order
+            if not emitted_reasoning and parser.reasoning is not None:
+                emitted_reasoning = True
+                yield {"type": "reasoning", "reasoning": parser.reasoning}
+            while emitted_reasoning and emitted_steps < len(parser.steps):
+                yield {"type": "step", "index": emitted_steps,
+                       "step": _normalize_step(parser.steps[emitted_steps], user_input)}
+                emitted_steps += 1
+        result = _parse_agent_content(parser.buffer, user_input)
+    except Exception as e:
+        result = _error_response(e)
+
+    # Emit whatever the incremental parser could not
+    if not emitted_reasoning:
+        yield {"type": "reasoning", "reasoning": result.get("reasoning", "No reasoning provided")}
+    for index, step in enumerate(result.get("tool_sequence", [])[emitted_steps:], emitted_steps):
+        yield {"type": "step", "index": index, "step": copy.deepcopy(step)}
+    yield {"type": "final", "response": result}
 
 # Example usage
 if __name__ == "__main__":